@@ -0,0 +1,81 @@
+import os
+
+from django.core.management.base import BaseCommand
+from backend.storage import BLOB_DIR, DedupFileSystemStorage, file_digest, tag_digest
+
+class Command(BaseCommand):
+    help = 'Rehash everything under MEDIA_ROOT into the content-addressed blob store and report the space reclaimed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be reclaimed without changing anything')
+
+    def handle(self, *args, **options):
+        storage = DedupFileSystemStorage()
+        root = storage.location
+        dry_run = options['dry_run']
+        scanned = linked = reclaimed = 0
+        # Blob path -> inode of the first copy seen, for blobs a dry run hasn't created
+        first_copies = {}
+
+        for directory, subdirectories, files in os.walk(root):
+            if os.path.relpath(directory, root) == '.':
+                subdirectories[:] = [name for name in subdirectories if name != BLOB_DIR]
+            for filename in files:
+                path = os.path.join(directory, filename)
+                if os.path.islink(path):
+                    continue
+                scanned += 1
+                stat = os.stat(path)
+                inode = (stat.st_dev, stat.st_ino)
+                digest = file_digest(path)
+                blob = storage.path(storage.blob_name(digest, filename))
+                if os.path.exists(blob):
+                    if not dry_run:
+                        # Blobs stored before digests were tagged
+                        tag_digest(blob, digest)
+                    blob_stat = os.stat(blob)
+                    target = (blob_stat.st_dev, blob_stat.st_ino)
+                else:
+                    target = first_copies.get(blob)
+
+                if target is None:
+                    # First copy of this content becomes the blob
+                    first_copies[blob] = inode
+                    if not dry_run:
+                        os.makedirs(os.path.dirname(blob), exist_ok=True)
+                        os.link(path, blob)
+                        tag_digest(blob, digest)
+                    continue
+                if inode == target:
+                    continue
+
+                linked += 1
+                # Only the last link to an inode actually frees its blocks
+                if stat.st_nlink == 1:
+                    reclaimed += stat.st_size
+                if not dry_run:
+                    # Swap the copy for a link to the blob in one rename
+                    staged = f'{path}.dedup'
+                    os.link(blob, staged)
+                    os.replace(staged, path)
+
+        # Blobs nothing points at any more
+        orphans = 0
+        blob_root = storage.path(BLOB_DIR)
+        for directory, subdirectories, files in os.walk(blob_root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                stat = os.stat(path)
+                if stat.st_nlink == 1:
+                    orphans += 1
+                    reclaimed += stat.st_size
+                    if not dry_run:
+                        os.remove(path)
+
+        verb = 'Would reclaim' if dry_run else 'Reclaimed'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Scanned {scanned} files, {"found" if dry_run else "linked"} {linked} duplicates, removed {orphans} unreferenced blobs. '
+                f'{verb} {reclaimed / (1024 * 1024):.2f} MB'
+            )
+        )
@@ -0,0 +1,31 @@
+import os
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from assignments.models import SubmissionUpload
+from assignments.uploads import TEMP_DIR, discard
+
+class Command(BaseCommand):
+    help = 'Delete chunked submission uploads that have not been touched for a while, and any orphaned temp files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Idle time after which an upload is abandoned')
+
+    def handle(self, *args, **options):
+        stale = SubmissionUpload.objects.filter(updated_at__lt=timezone.now() - timedelta(hours=options['hours']))
+        for upload in stale:
+            discard(upload)
+        removed, _ = stale.delete()
+
+        # Temp files whose upload row went away with its assignment or student
+        live = {f'{upload_id}.part' for upload_id in SubmissionUpload.objects.values_list('id', flat=True)}
+        orphans = 0
+        if os.path.isdir(TEMP_DIR):
+            for name in os.listdir(TEMP_DIR):
+                if name.endswith('.part') and name not in live:
+                    os.remove(os.path.join(TEMP_DIR, name))
+                    orphans += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Purged {removed} stale uploads and {orphans} orphaned temp files')
+        )
@@ -0,0 +1,115 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, quote_etag
+
+# None serves bytes from Django; 'x-accel-redirect' (nginx) or 'x-sendfile'
+# (Apache, lighttpd) hands the file to the front proxy instead
+SENDFILE_BACKEND = getattr(settings, 'MEDIA_SENDFILE_BACKEND', None)
+# nginx location marked ``internal`` that aliases MEDIA_ROOT
+ACCEL_REDIRECT_PREFIX = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """Read-only view of ``length`` bytes of ``file`` starting at ``start``."""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    ``(start, end)`` for a single ``bytes=`` range, None to ignore the header
+    and send everything, or ``False`` when the range can't be satisfied.
+    """
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+def serve_file(request, storage, name, filename=None):
+    """
+    Serve a stored file with ETag/Last-Modified validation (304s for
+    unchanged files) and single-range requests (206). When a sendfile backend
+    is configured only the headers are produced and the proxy streams the
+    bytes, including any ranges.
+    """
+    path = storage.path(name)
+    stat = os.stat(path)
+    etag = quote_etag(f'{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    last_modified = int(stat.st_mtime)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        not_modified['Cache-Control'] = 'private, no-cache'
+        return not_modified
+
+    filename = filename or os.path.basename(name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    if SENDFILE_BACKEND:
+        response = HttpResponse(content_type=content_type)
+        if SENDFILE_BACKEND == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(name.lstrip('/'))
+        else:
+            response['X-Sendfile'] = path
+    else:
+        byte_range = None
+        if_range = request.headers.get('If-Range')
+        if not if_range or if_range in (etag, http_date(last_modified)):
+            byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+        if byte_range:
+            start, end = byte_range
+            response = FileResponse(
+                RangeFile(open(path, 'rb'), start, end - start + 1), status=206, content_type=content_type,
+            )
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        else:
+            # A real file object lets the WSGI server use its sendfile path
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    response['Content-Disposition'] = content_disposition_header(False, filename)
+    return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='attachment',
+            field=models.FileField(blank=True, null=True, upload_to='submissions/'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0004_submission_attachment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(('grade__isnull', True)), fields=['assignment', 'submitted_at', 'id'], name='submission_ungraded_idx'),
+        ),
+    ]
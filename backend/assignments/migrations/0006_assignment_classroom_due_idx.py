@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0005_submission_ungraded_idx'),
+        ('classroom', '0009_gradesummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['classroom', 'due_date'], name='assignment_classroom_due_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:00
+
+import backend.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0007_submissionupload'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='submission',
+            name='attachment',
+            field=models.FileField(blank=True, null=True, storage=backend.storage.dedup_storage, upload_to='submissions/'),
+        ),
+    ]
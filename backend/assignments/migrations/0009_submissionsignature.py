@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0008_submission_attachment_dedup_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionSignature',
+            fields=[
+                ('submission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='assignments.submission')),
+                ('minhash', models.BinaryField()),
+                ('shingles', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='signatures', to='assignments.assignment')),
+            ],
+        ),
+    ]
@@ -1,6 +1,11 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
 from django.conf import settings
-from classroom.models import Classroom
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from backend.storage import dedup_storage
+from classroom.models import Classroom, GradeSummary, deleted_with_user
 
 class Assignment(models.Model):
     title = models.CharField(max_length=255)
@@ -11,17 +16,126 @@ class Assignment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, default='published')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['classroom', 'due_date'], name='assignment_classroom_due_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous_points = None
+            if self.pk:
+                previous_points = Assignment.objects.select_for_update().filter(pk=self.pk).values_list('points', flat=True).first()
+            super().save(*args, **kwargs)
+            if previous_points is not None and previous_points != self.points:
+                # Every graded submission is now weighed against the new total
+                GradeSummary.apply(
+                    (student_id, (grade, previous_points), (grade, self.points))
+                    for student_id, grade in self.submissions.filter(grade__isnull=False).values_list('student_id', 'grade')
+                )
+
+def release_attachment(name):
+    """Delete a replaced attachment's file once the change commits, unless a submission still points at it."""
+    def delete():
+        if not Submission.objects.filter(attachment=name).exists():
+            Submission._meta.get_field('attachment').storage.delete(name)
+    transaction.on_commit(delete)
+
 class Submission(models.Model):
     assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='submissions')
     student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='submissions')
     content = models.TextField(null=True, blank=True)
-    attachment = models.FileField(upload_to='submissions/', null=True, blank=True)
+    attachment = models.FileField(upload_to='submissions/', storage=dedup_storage, null=True, blank=True)
     grade = models.FloatField(null=True, blank=True)
     feedback = models.TextField(null=True, blank=True)
     submitted_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('assignment', 'student')
+        indexes = [
+            # Covers the grading queue: ungraded rows only, already in queue order per assignment
+            models.Index(
+                fields=['assignment', 'submitted_at', 'id'],
+                condition=models.Q(grade__isnull=True),
+                name='submission_ungraded_idx',
+            ),
+        ]
+
+    @classmethod
+    def pending_for_teacher(cls, teacher):
+        """Ungraded submissions across every classroom ``teacher`` runs."""
+        return cls.objects.filter(
+            grade__isnull=True,
+            assignment__in=Assignment.objects.filter(classroom__teacher=teacher).values('id'),
+        )
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                # Locked so two concurrent gradings can't both apply a delta from the same old grade
+                previous = (
+                    Submission.objects.select_for_update(of=('self',)).filter(pk=self.pk)
+                    .values_list('student_id', 'grade', 'assignment__points', 'attachment').first()
+                )
+            super().save(*args, **kwargs)
+            if previous and previous[3] and previous[3] != self.attachment.name:
+                release_attachment(previous[3])
+            if self.grade is None and (previous is None or previous[1] is None):
+                return
+            old = (previous[1], previous[2]) if previous else None
+            new = (self.grade, self.assignment.points)
+            if previous and previous[0] != self.student_id:
+                GradeSummary.apply([(previous[0], old, None), (self.student_id, None, new)])
+            else:
+                GradeSummary.apply([(self.student_id, old, new)])
+
+class SubmissionUpload(models.Model):
+    """
+    An attachment being uploaded in chunks. Bytes go to a temp file on disk
+    (see ``assignments.uploads``); ``received`` is how much of it has landed,
+    which is where an interrupted client resumes from.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='uploads')
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='submission_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    checksum = models.CharField(max_length=64)
+    received = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+class SubmissionSignature(models.Model):
+    """
+    MinHash signature of a submission's text (see ``assignments.similarity``),
+    kept so near-duplicate reports never re-read or re-shingle every essay.
+    """
+    submission = models.OneToOneField(Submission, on_delete=models.CASCADE, primary_key=True, related_name='signature')
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='signatures')
+    minhash = models.BinaryField()
+    shingles = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Signature for submission {self.submission_id}"
+
+@receiver(post_delete, sender=Submission)
+def remove_submission_from_summary(sender, instance, origin=None, **kwargs):
+    # A signal rather than delete() so cascades from assignments and
+    # classrooms are counted too
+    if deleted_with_user(origin, instance.student_id):
+        return
+    if instance.grade is not None:
+        GradeSummary.apply([(instance.student_id, (instance.grade, instance.assignment.points), None)])
+
+@receiver(post_delete, sender=Submission)
+def delete_submission_attachment(sender, instance, **kwargs):
+    if instance.attachment:
+        release_attachment(instance.attachment.name)
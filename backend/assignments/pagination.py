@@ -0,0 +1,23 @@
+from django.db.models import Q
+
+from backend import cursors
+
+def encode_cursor(due_date, submitted_at, submission_id):
+    return cursors.encode(due_date, submitted_at, submission_id)
+
+def decode_cursor(cursor):
+    return cursors.decode(cursor, cursors.optional(cursors.timestamp), cursors.timestamp, int)
+
+def after_queue_position(due_date, submitted_at, submission_id):
+    """
+    Rows strictly after the given position in grading-queue order
+    (assignment due date with undated assignments last, then submitted_at, then id).
+    """
+    same_due_later = Q(submitted_at__gt=submitted_at) | Q(submitted_at=submitted_at, id__gt=submission_id)
+    if due_date is None:
+        return Q(assignment__due_date__isnull=True) & same_due_later
+    return (
+        Q(assignment__due_date__gt=due_date)
+        | Q(assignment__due_date=due_date) & same_due_later
+        | Q(assignment__due_date__isnull=True)
+    )
@@ -1,13 +1,101 @@
+import os
+import re
+
 from rest_framework import serializers
-from .models import Assignment, Submission
+from backend.previews import is_truncated, preview
+from .models import Assignment, Submission, SubmissionUpload
+from .uploads import MAX_FILE_SIZE
+
+# Characters of assignment descriptions and submission text shown in lists
+TEXT_PREVIEW_LENGTH = 200
 
 class AssignmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Assignment
         fields = '__all__'
 
+class AssignmentListSerializer(serializers.ModelSerializer):
+    description = serializers.SerializerMethodField()
+    description_truncated = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Assignment
+        fields = '__all__'
+
+    def get_description(self, instance):
+        return preview(instance.description_preview, TEXT_PREVIEW_LENGTH)
+
+    def get_description_truncated(self, instance):
+        return is_truncated(instance.description_preview, TEXT_PREVIEW_LENGTH)
+
+class UpcomingAssignmentSerializer(serializers.ModelSerializer):
+    classroom_name = serializers.ReadOnlyField(source='classroom.name')
+    course_title = serializers.ReadOnlyField(source='classroom.course.title')
+
+    class Meta:
+        model = Assignment
+        fields = ['id', 'title', 'due_date', 'points', 'classroom', 'classroom_name', 'course_title', 'status']
+
 class SubmissionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Submission
         fields = '__all__'
         read_only_fields = ('student',)
+
+class SubmissionListSerializer(serializers.ModelSerializer):
+    content = serializers.SerializerMethodField()
+    content_truncated = serializers.SerializerMethodField()
+    feedback = serializers.SerializerMethodField()
+    feedback_truncated = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Submission
+        fields = '__all__'
+
+    def get_content(self, instance):
+        return preview(instance.content_preview, TEXT_PREVIEW_LENGTH)
+
+    def get_content_truncated(self, instance):
+        return is_truncated(instance.content_preview, TEXT_PREVIEW_LENGTH)
+
+    def get_feedback(self, instance):
+        return preview(instance.feedback_preview, TEXT_PREVIEW_LENGTH)
+
+    def get_feedback_truncated(self, instance):
+        return is_truncated(instance.feedback_preview, TEXT_PREVIEW_LENGTH)
+
+class GradeSerializer(serializers.Serializer):
+    # Omitting the grade clears it, as it always has
+    grade = serializers.FloatField(allow_null=True, default=None)
+    feedback = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+class BatchGradeItemSerializer(serializers.Serializer):
+    submission = serializers.IntegerField()
+    grade = serializers.FloatField(allow_null=True)
+    feedback = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+class BatchGradeSerializer(serializers.Serializer):
+    grades = BatchGradeItemSerializer(many=True, allow_empty=False)
+
+class SubmissionUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SubmissionUpload
+        fields = ['id', 'assignment', 'filename', 'size', 'checksum', 'received', 'created_at']
+        read_only_fields = ['id', 'received', 'created_at']
+
+    def validate_filename(self, value):
+        name = os.path.basename(value.replace('\\', '/'))
+        if not name:
+            raise serializers.ValidationError("A file name is required")
+        return name
+
+    def validate_size(self, value):
+        if value < 0 or value > MAX_FILE_SIZE:
+            raise serializers.ValidationError(f"Size must be between 0 and {MAX_FILE_SIZE} bytes")
+        return value
+
+    def validate_checksum(self, value):
+        value = value.lower()
+        if not re.fullmatch(r'[0-9a-f]{64}', value):
+            raise serializers.ValidationError("Checksum must be a hex SHA-256 digest")
+        return value
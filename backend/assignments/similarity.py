@@ -0,0 +1,143 @@
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+from .models import Submission, SubmissionSignature
+
+SHINGLE_SIZE = 5
+PERMUTATIONS = 128
+# 32 bands of 4 rows: pairs around 0.4 Jaccard or more almost always share a bucket
+BANDS = 32
+ROWS = PERMUTATIONS // BANDS
+PRIME = 4294967311  # smallest prime above 2**32
+MIN_SHINGLES = 3
+# Fixed seed so signatures stored by different processes stay comparable
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, 2 ** 31, size=PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, 2 ** 31, size=PERMUTATIONS, dtype=np.uint64)
+EMPTY = np.full(PERMUTATIONS, np.iinfo(np.uint32).max, dtype=np.uint32)
+WORD = re.compile(r'\w+')
+
+
+def shingles(text):
+    """CRC32 of every SHINGLE_SIZE-word window of the normalised text."""
+    words = WORD.findall((text or '').lower())
+    if len(words) < SHINGLE_SIZE:
+        return np.array([zlib.crc32(' '.join(words).encode())] if words else [], dtype=np.uint64)
+    return np.unique(np.fromiter(
+        (zlib.crc32(' '.join(words[i:i + SHINGLE_SIZE]).encode()) for i in range(len(words) - SHINGLE_SIZE + 1)),
+        dtype=np.uint64,
+    ))
+
+
+def minhash(hashed):
+    """Minimum of each of PERMUTATIONS universal hashes over the shingle set."""
+    if len(hashed) == 0:
+        return EMPTY.copy()
+    # a < 2**31 and x < 2**32, so a*x + b stays inside uint64
+    permuted = (np.outer(hashed, _A) + _B) % PRIME
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def signature_for(submission_id, assignment_id, content):
+    hashed = shingles(content)
+    return SubmissionSignature(
+        submission_id=submission_id,
+        assignment_id=assignment_id,
+        minhash=minhash(hashed).tobytes(),
+        shingles=len(hashed),
+    )
+
+
+def save_signatures(signatures):
+    SubmissionSignature.objects.bulk_create(
+        signatures,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['submission'],
+        update_fields=['assignment', 'minhash', 'shingles', 'updated_at'],
+    )
+
+
+def update_signature(submission):
+    """Recompute one submission's signature after its content changed."""
+    save_signatures([signature_for(submission.id, submission.assignment_id, submission.content)])
+
+
+def backfill(assignment):
+    """Sign any of the assignment's submissions that don't have a signature yet."""
+    missing = (
+        Submission.objects.filter(assignment=assignment, signature__isnull=True)
+        .values_list('id', 'content')
+        .iterator(chunk_size=500)
+    )
+    batch = []
+    for submission_id, content in missing:
+        batch.append(signature_for(submission_id, assignment.id, content))
+        if len(batch) >= 500:
+            save_signatures(batch)
+            batch = []
+    if batch:
+        save_signatures(batch)
+
+
+def candidate_pairs(signatures):
+    """Index pairs that agree on every row of at least one band."""
+    pairs = set()
+    for band in range(BANDS):
+        buckets = defaultdict(list)
+        rows = signatures[:, band * ROWS:(band + 1) * ROWS]
+        for index, key in enumerate(map(bytes, rows)):
+            buckets[key].append(index)
+        for members in buckets.values():
+            for i, first in enumerate(members):
+                for second in members[i + 1:]:
+                    pairs.add((first, second))
+    return pairs
+
+
+def similarity_report(assignment, threshold=0.5):
+    """
+    Pairs of the assignment's submissions whose estimated Jaccard similarity
+    (share of matching MinHash rows) is at least ``threshold``. Only pairs
+    that share an LSH bucket are compared, so the work grows with the number
+    of submissions rather than the number of pairs.
+    """
+    backfill(assignment)
+    rows = list(
+        SubmissionSignature.objects.filter(assignment=assignment, shingles__gte=MIN_SHINGLES)
+        .order_by('submission_id')
+        .values_list('submission_id', 'submission__student_id', 'submission__student__name', 'minhash')
+    )
+    if len(rows) < 2:
+        return {'assignment': assignment.id, 'threshold': threshold, 'compared': len(rows), 'candidates': 0, 'pairs': []}
+
+    signatures = np.frombuffer(b''.join(bytes(row[3]) for row in rows), dtype=np.uint32).reshape(len(rows), PERMUTATIONS)
+    candidates = sorted(candidate_pairs(signatures))
+    if candidates:
+        first, second = np.array(candidates).T
+        scores = (signatures[first] == signatures[second]).mean(axis=1)
+    else:
+        first = second = scores = np.array([])
+
+    pairs = []
+    for a, b, score in zip(first.tolist(), second.tolist(), scores.tolist()):
+        if score >= threshold:
+            pairs.append({
+                'similarity': round(score, 3),
+                'submissions': [rows[a][0], rows[b][0]],
+                'students': [
+                    {'id': rows[a][1], 'name': rows[a][2]},
+                    {'id': rows[b][1], 'name': rows[b][2]},
+                ],
+            })
+    pairs.sort(key=lambda pair: -pair['similarity'])
+    return {
+        'assignment': assignment.id,
+        'threshold': threshold,
+        'compared': len(rows),
+        'candidates': len(candidates),
+        'pairs': pairs,
+    }
@@ -1,3 +1,433 @@
-from django.test import TestCase
+import base64
+import csv
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from classroom.models import Classroom, Enrollment, GradeSummary
+from courses.models import Course
+from users.models import User
+from . import similarity, uploads
+from .models import Assignment, Submission, SubmissionUpload
+
+
+class GradeSubmissionTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', email='teacher@example.com', password='pw', role='teacher')
+        course = Course.objects.create(title='Physics', teacher=self.teacher)
+        classroom = Classroom.objects.create(name='Physics A', course=course, teacher=self.teacher)
+        self.student = User.objects.create_user(username='student', email='student@example.com', password='pw')
+        assignment = Assignment.objects.create(title='Lab', classroom=classroom, points=100)
+        self.submission = Submission.objects.create(assignment=assignment, student=self.student, content='Answer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def test_form_encoded_grade_is_coerced(self):
+        response = self.client.post(f'/api/assignments/submissions/{self.submission.id}/grade', {'grade': '80', 'feedback': 'Good'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['grade'], 80.0)
+        summary = GradeSummary.objects.get(user=self.student)
+        self.assertEqual((summary.earned, summary.possible), (80, 100))
+
+    def test_non_numeric_grade_is_rejected(self):
+        response = self.client.post(f'/api/assignments/submissions/{self.submission.id}/grade', {'grade': 'A+'})
+
+        self.assertEqual(response.status_code, 400)
+        self.submission.refresh_from_db()
+        self.assertIsNone(self.submission.grade)
+
+    def test_students_cannot_grade_their_own_submission(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        response = client.post(f'/api/assignments/submissions/{self.submission.id}/grade', {'grade': 50}, format='json')
+
+        self.assertEqual(response.status_code, 403)
+        self.submission.refresh_from_db()
+        self.assertIsNone(self.submission.grade)
+        self.assertFalse(GradeSummary.objects.filter(user=self.student, graded_items__gt=0).exists())
+
+    def test_tampered_queue_cursor_is_rejected(self):
+        cursor = base64.urlsafe_b64encode(json.dumps([None, '2024-01-01T00:00:00Z', 'x']).encode()).decode()
+        response = self.client.get('/api/assignments/submissions/queue', {'cursor': cursor})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'cursor': 'Invalid cursor'})
+
+    def test_non_numeric_queue_classroom_is_rejected(self):
+        response = self.client.get('/api/assignments/submissions/queue', {'classroomId': 'abc'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'classroomId must be a number'})
+
+
+class UpcomingAssignmentTests(TestCase):
+    def setUp(self):
+        teacher = User.objects.create_user(username='teacher', email='teacher@example.com', password='pw', role='teacher')
+        course = Course.objects.create(title='Physics', teacher=teacher)
+        classroom = Classroom.objects.create(name='Physics A', course=course, teacher=teacher)
+        other = Classroom.objects.create(name='Physics B', course=course, teacher=teacher)
+        self.student = User.objects.create_user(username='student', email='student@example.com', password='pw')
+        Enrollment.objects.create(user=self.student, classroom=classroom)
+
+        now = timezone.now()
+        self.soon = Assignment.objects.create(title='Soon', classroom=classroom, due_date=now + timedelta(days=2))
+        self.later = Assignment.objects.create(title='Later', classroom=classroom, due_date=now + timedelta(days=20))
+        Assignment.objects.create(title='Overdue', classroom=classroom, due_date=now - timedelta(hours=1))
+        Assignment.objects.create(title='Undated', classroom=classroom)
+        Assignment.objects.create(title='Not enrolled', classroom=other, due_date=now + timedelta(days=1))
+        submitted = Assignment.objects.create(title='Done', classroom=classroom, due_date=now + timedelta(days=1))
+        Submission.objects.create(assignment=submitted, student=self.student, content='Answer')
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def upcoming(self, **params):
+        return self.client.get('/api/assignments/upcoming', params)
+
+    def test_only_unsubmitted_work_due_inside_the_window(self):
+        self.assertEqual([row['id'] for row in self.upcoming().data], [self.soon.id])
+        self.assertEqual([row['id'] for row in self.upcoming(days=30).data], [self.soon.id, self.later.id])
+        self.assertEqual(self.upcoming().data[0]['classroom_name'], 'Physics A')
+
+    def test_non_numeric_window_is_rejected(self):
+        self.assertEqual(self.upcoming(days='soon').status_code, 400)
+
+
+class SimilarityReportTests(TestCase):
+    essay = (
+        'The experiment measured how the period of a pendulum changes with its length. We timed twenty swings '
+        'for five lengths between twenty and one hundred centimetres and found that the period grows with the '
+        'square root of the length, as the simple pendulum model predicts, within the error of our stopwatch.'
+    )
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', email='teacher@example.com', password='pw', role='teacher')
+        course = Course.objects.create(title='Physics', teacher=self.teacher)
+        classroom = Classroom.objects.create(name='Physics A', course=course, teacher=self.teacher)
+        self.assignment = Assignment.objects.create(title='Pendulum', classroom=classroom, points=100)
+        contents = [
+            self.essay,
+            self.essay.replace('five lengths', 'six lengths').replace('stopwatch', 'phone timer'),
+            'Our group looked at projectile range instead, launching a ball from a spring at several angles '
+            'and recording where it landed; forty five degrees went furthest, though air resistance mattered.',
+            'Too short to compare.',
+        ]
+        self.submissions = [
+            Submission.objects.create(
+                assignment=self.assignment, content=content,
+                student=User.objects.create_user(username=f'student{i}', email=f'student{i}@example.com', password='pw'),
+            )
+            for i, content in enumerate(contents)
+        ]
+
+    def report(self, **params):
+        client = APIClient()
+        client.force_authenticate(self.teacher)
+        return client.get(f'/api/assignments/{self.assignment.id}/similarity', params)
+
+    def test_near_duplicate_is_flagged(self):
+        data = self.report().data
+
+        self.assertEqual(data['compared'], 3)
+        self.assertEqual([pair['submissions'] for pair in data['pairs']], [[self.submissions[0].id, self.submissions[1].id]])
+        self.assertGreater(data['pairs'][0]['similarity'], 0.5)
+
+    def test_identical_text_scores_one(self):
+        self.submissions[2].content = self.essay
+        self.submissions[2].save()
+        similarity.update_signature(self.submissions[2])
+
+        pairs = self.report(threshold=0.99).data['pairs']
+        self.assertEqual([(pair['submissions'], pair['similarity']) for pair in pairs], [
+            ([self.submissions[0].id, self.submissions[2].id], 1.0),
+        ])
+
+
+class BatchGradeTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', email='teacher@example.com', password='pw', role='teacher')
+        other_teacher = User.objects.create_user(username='other', email='other@example.com', password='pw', role='teacher')
+        self.student = User.objects.create_user(username='student', email='student@example.com', password='pw')
+        self.mine = [self.submission(self.teacher, title) for title in ('Lab 1', 'Lab 2')]
+        self.theirs = self.submission(other_teacher, 'Essay')
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def submission(self, teacher, title):
+        course = Course.objects.create(title=title, teacher=teacher)
+        classroom = Classroom.objects.create(name=title, course=course, teacher=teacher)
+        assignment = Assignment.objects.create(title=title, classroom=classroom, points=100)
+        return Submission.objects.create(assignment=assignment, student=self.student, content='Answer')
+
+    def batch_grade(self, grades, client=None):
+        return (client or self.client).post('/api/assignments/submissions/batch-grade', {'grades': grades}, format='json')
+
+    def test_grades_only_the_teachers_own_submissions(self):
+        response = self.batch_grade([
+            {'submission': self.mine[0].id, 'grade': 70, 'feedback': 'Fine'},
+            {'submission': self.theirs.id, 'grade': 100},
+            {'submission': self.mine[1].id, 'grade': 90},
+            {'submission': 0, 'grade': 10},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual([result['status'] for result in response.data['results']], ['graded', 'error', 'graded', 'error'])
+        self.theirs.refresh_from_db()
+        self.assertIsNone(self.theirs.grade)
+        self.mine[0].refresh_from_db()
+        self.assertEqual((self.mine[0].grade, self.mine[0].feedback), (70, 'Fine'))
+        summary = GradeSummary.objects.get(user=self.student)
+        self.assertEqual((summary.earned, summary.possible, summary.graded_items), (160, 200, 2))
+
+    def test_invalid_batches_are_rejected(self):
+        self.assertEqual(self.batch_grade([]).status_code, 400)
+        self.assertEqual(self.batch_grade([{'submission': self.mine[0].id, 'grade': 'A+'}]).status_code, 400)
+        student = APIClient()
+        student.force_authenticate(self.student)
+        self.assertEqual(self.batch_grade([{'submission': self.mine[0].id, 'grade': 100}], student).status_code, 403)
+        self.assertFalse(Submission.objects.filter(grade__isnull=False).exists())
+
+
+class TemporaryMediaMixin:
+    """Points MEDIA_ROOT and the upload temp dir at a directory removed after each test."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        temp_dir = mock.patch('assignments.uploads.TEMP_DIR', os.path.join(media_root, 'upload_tmp'))
+        temp_dir.start()
+        self.addCleanup(temp_dir.stop)
+
+
+class ChunkedUploadTests(TemporaryMediaMixin, TestCase):
+    content = b'0123456789' * 10
+
+    def setUp(self):
+        super().setUp()
+        teacher = User.objects.create_user(username='teacher', email='teacher@example.com', password='pw', role='teacher')
+        course = Course.objects.create(title='Physics', teacher=teacher)
+        classroom = Classroom.objects.create(name='Physics A', course=course, teacher=teacher)
+        self.assignment = Assignment.objects.create(title='Lab', classroom=classroom, points=100)
+        self.student = User.objects.create_user(username='student', email='student@example.com', password='pw')
+        Enrollment.objects.create(user=self.student, classroom=classroom)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def start(self, checksum=None):
+        return self.client.post('/api/assignments/uploads', {
+            'assignment': self.assignment.id, 'filename': 'report.pdf', 'size': len(self.content),
+            'checksum': checksum or hashlib.sha256(self.content).hexdigest(),
+        }, format='json')
+
+    def chunk(self, upload_id, offset, data):
+        return self.client.put(
+            f'/api/assignments/uploads/{upload_id}/chunk?offset={offset}', data, content_type='application/octet-stream',
+        )
+
+    def finalize(self, upload_id):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f'/api/assignments/uploads/{upload_id}/finalize', {'content': 'See attached'}, format='json')
+
+    def test_interrupted_upload_resumes_where_it_stopped(self):
+        upload_id = self.start().data['id']
+        self.assertEqual(self.chunk(upload_id, 0, self.content[:40]).data['received'], 40)
+        SubmissionUpload.objects.filter(pk=upload_id).update(updated_at=timezone.now() - timedelta(days=1))
+
+        # Starting the same file again picks the existing upload back up
+        resumed = self.start()
+        self.assertEqual((resumed.status_code, resumed.data['id'], resumed.data['received']), (200, upload_id, 40))
+        self.assertEqual(self.chunk(upload_id, 40, self.content[40:]).data['received'], 100)
+        self.assertGreater(SubmissionUpload.objects.get(pk=upload_id).updated_at, timezone.now() - timedelta(minutes=1))
+
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 200)
+        submission = Submission.objects.get(assignment=self.assignment, student=self.student)
+        self.assertEqual(submission.content, 'See attached')
+        with submission.attachment.open('rb') as attachment:
+            self.assertEqual(attachment.read(), self.content)
+        self.assertFalse(SubmissionUpload.objects.filter(pk=upload_id).exists())
+
+    def test_chunk_at_the_wrong_offset_conflicts(self):
+        upload_id = self.start().data['id']
+        self.chunk(upload_id, 0, self.content[:40])
+
+        response = self.chunk(upload_id, 0, self.content[:40])
+        self.assertEqual((response.status_code, response.data['received']), (409, 40))
+        self.assertEqual(self.chunk(upload_id, 60, self.content[60:]).status_code, 409)
+        self.assertEqual(self.finalize(upload_id).status_code, 400)
+
+    def test_checksum_mismatch_discards_the_bytes(self):
+        upload_id = self.start(checksum='0' * 64).data['id']
+        self.chunk(upload_id, 0, self.content)
+
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(SubmissionUpload.objects.get(pk=upload_id).received, 0)
+        self.assertFalse(os.path.exists(uploads.temp_path(SubmissionUpload.objects.get(pk=upload_id))))
+        self.assertFalse(Submission.objects.exists())
+
+
+class AttachmentStorageTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        teacher = User.objects.create_user(username='teacher', email='teacher@example.com', password='pw', role='teacher')
+        course = Course.objects.create(title='Physics', teacher=teacher)
+        classroom = Classroom.objects.create(name='Physics A', course=course, teacher=teacher)
+        self.assignment = Assignment.objects.create(title='Lab', classroom=classroom, points=100)
+        self.storage = Submission._meta.get_field('attachment').storage
+
+    def submit(self, username, content):
+        student = User.objects.filter(username=username).first() or User.objects.create_user(
+            username=username, email=f'{username}@example.com', password='pw',
+        )
+        client = APIClient()
+        client.force_authenticate(student)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(f'/api/assignments/{self.assignment.id}/submit', {
+                'content': 'Report', 'attachment': SimpleUploadedFile('report.pdf', content),
+            }, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        return Submission.objects.get(assignment=self.assignment, student=student)
+
+    def blobs(self):
+        return [name for directory, _, names in os.walk(self.storage.path('.blobs')) for name in names]
+
+    def test_identical_attachments_share_one_blob(self):
+        first = self.submit('first', b'same bytes')
+        second = self.submit('second', b'same bytes')
+
+        self.assertNotEqual(first.attachment.name, second.attachment.name)
+        self.assertEqual(len(self.blobs()), 1)
+        self.assertEqual(self.storage.references(first.attachment.name), 2)
+        with self.storage.open(second.attachment.name) as attachment:
+            self.assertEqual(attachment.read(), b'same bytes')
+
+    def test_replaced_and_deleted_attachments_release_their_blob(self):
+        first = self.submit('first', b'same bytes')
+        second = self.submit('second', b'same bytes')
+
+        # Resolving the blob must not mean reading the file back
+        with mock.patch('backend.storage.file_digest', side_effect=AssertionError('rehashed')):
+            replaced = self.submit('first', b'new bytes')
+            self.assertFalse(self.storage.exists(first.attachment.name))
+            self.assertEqual(self.storage.references(second.attachment.name), 1)
+            self.assertEqual(len(self.blobs()), 2)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                second.delete()
+            self.assertFalse(self.storage.exists(second.attachment.name))
+            self.assertEqual(len(self.blobs()), 1)
+            self.assertTrue(self.storage.exists(replaced.attachment.name))
+
+
+class SubmissionsZipTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User.objects.create_user(username='teacher', email='teacher@example.com', password='pw', role='teacher')
+        course = Course.objects.create(title='Physics', teacher=self.teacher)
+        classroom = Classroom.objects.create(name='Physics A', course=course, teacher=self.teacher)
+        self.assignment = Assignment.objects.create(title='Lab', classroom=classroom, points=100)
+        ann = User.objects.create_user(username='ann', email='ann@example.com', password='pw', name='Ann Lee')
+        ben = User.objects.create_user(username='ben', email='ben@example.com', password='pw', name='Ben')
+        self.with_file = Submission.objects.create(
+            assignment=self.assignment, student=ann, grade=90,
+            attachment=SimpleUploadedFile('lab report.pdf', b'%PDF-1.4 report'),
+        )
+        Submission.objects.create(assignment=self.assignment, student=ben, content='Typed answer')
+
+    def download(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(f'/api/assignments/{self.assignment.id}/download-submissions')
+
+    def test_archive_holds_attachments_and_a_manifest(self):
+        response = self.download(self.teacher)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        arcname = f'{self.with_file.student_id}_Ann_Lee/lab_report.pdf'
+        self.assertEqual(archive.namelist(), [arcname, 'manifest.csv'])
+        self.assertEqual(archive.read(arcname), b'%PDF-1.4 report')
+
+        manifest = list(csv.DictReader(io.StringIO(archive.read('manifest.csv').decode())))
+        self.assertEqual([(row['name'], row['grade'], row['file']) for row in manifest], [
+            ('Ann Lee', '90.0', arcname),
+            ('Ben', '', ''),
+        ])
+
+    def test_only_the_classroom_teacher_can_download(self):
+        other = User.objects.create_user(username='other', email='other@example.com', password='pw', role='teacher')
+        self.assertEqual(self.download(other).status_code, 403)
+
+
+class AttachmentDownloadTests(TemporaryMediaMixin, TestCase):
+    content = b'0123456789abcdef'
+
+    def setUp(self):
+        super().setUp()
+        teacher = User.objects.create_user(username='teacher', email='teacher@example.com', password='pw', role='teacher')
+        course = Course.objects.create(title='Physics', teacher=teacher)
+        classroom = Classroom.objects.create(name='Physics A', course=course, teacher=teacher)
+        assignment = Assignment.objects.create(title='Lab', classroom=classroom, points=100)
+        student = User.objects.create_user(username='student', email='student@example.com', password='pw')
+        self.submission = Submission.objects.create(
+            assignment=assignment, student=student, attachment=SimpleUploadedFile('notes.txt', self.content),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(student)
+
+    def download(self, **headers):
+        return self.client.get(f'/api/assignments/submissions/{self.submission.id}/attachment', **headers)
+
+    def test_whole_file(self):
+        response = self.download()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('notes.txt', response['Content-Disposition'])
+
+    def test_ranges(self):
+        response = self.download(HTTP_RANGE='bytes=2-5')
+        self.assertEqual((response.status_code, response['Content-Range']), (206, 'bytes 2-5/16'))
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+        response = self.download(HTTP_RANGE='bytes=-3')
+        self.assertEqual((response.status_code, b''.join(response.streaming_content)), (206, b'def'))
+
+        response = self.download(HTTP_RANGE='bytes=16-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */16'))
+
+    def test_validators(self):
+        etag = self.download()['ETag']
+
+        self.assertEqual(self.download(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # A range against an older version of the file gets the whole current file
+        response = self.download(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual((response.status_code, b''.join(response.streaming_content)), (200, self.content))
+        self.assertEqual(self.download(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE=etag).status_code, 206)
+
+    def test_sendfile_backend_only_sends_headers(self):
+        with mock.patch('assignments.media.SENDFILE_BACKEND', 'x-accel-redirect'):
+            response = self.download()
+
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.submission.attachment.name}')
+        self.assertEqual(response.content, b'')
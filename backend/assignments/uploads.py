@@ -0,0 +1,130 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from . import similarity
+from .models import Submission, SubmissionUpload
+
+TEMP_DIR = getattr(settings, 'SUBMISSION_UPLOAD_TEMP_DIR', os.path.join(settings.BASE_DIR, 'upload_tmp'))
+MAX_CHUNK_SIZE = getattr(settings, 'SUBMISSION_UPLOAD_MAX_CHUNK', 8 * 1024 * 1024)
+MAX_FILE_SIZE = getattr(settings, 'SUBMISSION_UPLOAD_MAX_SIZE', 2 * 1024 * 1024 * 1024)
+BLOCK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    status = 400
+
+
+class OffsetMismatch(UploadError):
+    status = 409
+
+
+class ChunkTooLarge(UploadError):
+    status = 413
+
+
+class TemporaryFile(File):
+    """A finished upload; FileSystemStorage moves it into place instead of copying."""
+
+    def temporary_file_path(self):
+        return self.name
+
+
+def temp_path(upload):
+    return os.path.join(TEMP_DIR, f'{upload.id}.part')
+
+def discard(upload):
+    try:
+        os.remove(temp_path(upload))
+    except FileNotFoundError:
+        pass
+
+def write_chunk(upload, offset, stream, length):
+    """
+    Stream ``length`` bytes from ``stream`` into the upload's temp file at
+    ``offset`` and return the new ``received``. Only what actually arrived is
+    counted, so a dropped connection resumes from the last byte on disk.
+    """
+    if offset != upload.received:
+        raise OffsetMismatch(f'Expected offset {upload.received}')
+    if length > MAX_CHUNK_SIZE:
+        raise ChunkTooLarge(f'Chunks may be at most {MAX_CHUNK_SIZE} bytes')
+    if offset + length > upload.size:
+        raise UploadError('Chunk runs past the declared file size')
+
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    path = temp_path(upload)
+    written = 0
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as part:
+        part.seek(offset)
+        while written < length and stream is not None:
+            block = stream.read(min(BLOCK_SIZE, length - written))
+            if not block:
+                break
+            part.write(block)
+            written += len(block)
+        # Drop anything a previous, abandoned attempt left past this point
+        part.truncate()
+
+    # Another request may have written the same range first; only one of them
+    # moves the offset on. update() skips auto_now, and purge_stale_uploads
+    # goes by updated_at, so bump it here
+    moved = SubmissionUpload.objects.filter(pk=upload.pk, received=offset).update(
+        received=offset + written, updated_at=timezone.now(),
+    )
+    if not moved:
+        upload.refresh_from_db(fields=['received'])
+        raise OffsetMismatch(f'Expected offset {upload.received}')
+    upload.received = offset + written
+    return upload.received
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as part:
+        for block in iter(lambda: part.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def finalize(upload, content=None):
+    """
+    Verify the assembled file against the checksum given at init and attach
+    it to the student's submission. A mismatch throws the bytes away so the
+    client starts over; otherwise the upload record is consumed.
+    """
+    if upload.received != upload.size:
+        raise UploadError(f'Upload incomplete: {upload.received} of {upload.size} bytes received')
+    path = temp_path(upload)
+    if not os.path.exists(path):
+        # Nothing was ever written for an empty file
+        os.makedirs(TEMP_DIR, exist_ok=True)
+        open(path, 'wb').close()
+    if file_checksum(path) != upload.checksum:
+        discard(upload)
+        SubmissionUpload.objects.filter(pk=upload.pk).update(received=0)
+        raise UploadError('Checksum mismatch; upload discarded')
+
+    field = Submission._meta.get_field('attachment')
+    with open(path, 'rb') as part:
+        name = field.storage.save(field.generate_filename(None, upload.filename), TemporaryFile(part, name=path))
+    discard(upload)
+    try:
+        with transaction.atomic():
+            submission, created = Submission.objects.select_for_update().get_or_create(
+                assignment_id=upload.assignment_id, student_id=upload.student_id,
+            )
+            submission.attachment.name = name
+            if content is not None:
+                submission.content = content
+            submission.save()
+            if not SubmissionUpload.objects.filter(pk=upload.pk).delete()[0]:
+                raise UploadError('Upload already finalized')
+            if content is not None:
+                similarity.update_signature(submission)
+    except Exception:
+        field.storage.delete(name)
+        raise
+    return submission
@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AssignmentViewSet, SubmissionViewSet
+from .views import AssignmentViewSet, SubmissionViewSet, SubmissionUploadViewSet
 
 router = DefaultRouter(trailing_slash=False)
 router.register(r'submissions', SubmissionViewSet)
+router.register(r'uploads', SubmissionUploadViewSet, basename='uploads')
 router.register(r'', AssignmentViewSet)
 
 urlpatterns = [
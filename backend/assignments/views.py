@@ -1,8 +1,23 @@
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Assignment, Submission
-from .serializers import AssignmentSerializer, SubmissionSerializer
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+from datetime import timedelta
+from classroom import analytics
+from classroom.models import Enrollment, GradeSummary
+from backend.previews import with_previews
+from . import similarity, uploads
+from .exports import submissions_zip
+from .media import serve_file
+from .models import Assignment, Submission, SubmissionUpload
+from .pagination import after_queue_position, decode_cursor, encode_cursor
+from .serializers import (
+    TEXT_PREVIEW_LENGTH, AssignmentSerializer, AssignmentListSerializer, SubmissionSerializer, SubmissionListSerializer,
+    BatchGradeSerializer, GradeSerializer, SubmissionUploadSerializer, UpcomingAssignmentSerializer,
+)
 
 class AssignmentViewSet(viewsets.ModelViewSet):
     queryset = Assignment.objects.all()
@@ -11,8 +26,57 @@ class AssignmentViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         classroom_id = self.request.query_params.get('classroomId')
         if classroom_id:
-            return Assignment.objects.filter(classroom_id=classroom_id)
-        return Assignment.objects.all()
+            queryset = Assignment.objects.filter(classroom_id=classroom_id)
+        else:
+            queryset = Assignment.objects.all()
+        if self.action == 'list':
+            queryset = with_previews(queryset, TEXT_PREVIEW_LENGTH, 'description')
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return AssignmentListSerializer
+        return AssignmentSerializer
+
+    @action(detail=False, methods=['get'])
+    def upcoming(self, request):
+        user = request.user
+        try:
+            days = min(max(int(request.query_params.get('days', 14)), 1), 90)
+        except ValueError:
+            return Response({"error": "days must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        now = timezone.now()
+        assignments = (
+            Assignment.objects.filter(
+                classroom__in=Enrollment.objects.filter(user=user).values('classroom'),
+                due_date__gte=now,
+                due_date__lt=now + timedelta(days=days),
+            )
+            .exclude(Exists(Submission.objects.filter(assignment=OuterRef('pk'), student=user)))
+            .select_related('classroom__course')
+            .order_by('due_date', 'id')
+        )
+        return Response(UpcomingAssignmentSerializer(assignments, many=True).data)
+
+    @action(detail=True, methods=['get'], url_path='download-submissions')
+    def download_submissions(self, request, pk=None):
+        assignment = self.get_object()
+        if request.user.role != 'teacher' or assignment.classroom.teacher_id != request.user.id:
+            return Response({"error": "Only the classroom teacher can download submissions"}, status=403)
+        response = StreamingHttpResponse(submissions_zip(assignment), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="submissions-{assignment.id}.zip"'
+        return response
+
+    @action(detail=True, methods=['get'], url_path='similarity')
+    def similarity_report(self, request, pk=None):
+        assignment = self.get_object()
+        if request.user.role != 'teacher' or assignment.classroom.teacher_id != request.user.id:
+            return Response({"error": "Only the classroom teacher can view similarity reports"}, status=403)
+        try:
+            threshold = min(max(float(request.query_params.get('threshold', 0.5)), 0.0), 1.0)
+        except ValueError:
+            return Response({"error": "threshold must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(similarity.similarity_report(assignment, threshold))
 
     @action(detail=True, methods=['post'])
     def submit(self, request, pk=None):
@@ -29,6 +93,7 @@ class AssignmentViewSet(viewsets.ModelViewSet):
             student=request.user,
             defaults=defaults
         )
+        similarity.update_signature(submission)
         return Response(SubmissionSerializer(submission).data)
 
 class SubmissionViewSet(viewsets.ModelViewSet):
@@ -38,10 +103,38 @@ class SubmissionViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.role == 'student':
-            return Submission.objects.filter(student=user)
+            queryset = Submission.objects.filter(student=user)
         elif user.role == 'teacher':
-            return Submission.objects.filter(assignment__classroom__teacher=user)
-        return Submission.objects.all()
+            queryset = Submission.objects.filter(assignment__classroom__teacher=user)
+        else:
+            queryset = Submission.objects.all()
+        if self.action == 'list':
+            queryset = with_previews(queryset, TEXT_PREVIEW_LENGTH, 'content', 'feedback')
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return SubmissionListSerializer
+        return SubmissionSerializer
+
+    def perform_update(self, serializer):
+        previous_assignment_id = serializer.instance.assignment_id
+        submission = serializer.save()
+        if {'content', 'assignment'} & serializer.validated_data.keys():
+            similarity.update_signature(submission)
+        analytics.invalidate_assignments({previous_assignment_id, submission.assignment_id})
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        analytics.invalidate_assignments([instance.assignment_id])
+
+    @action(detail=True, methods=['get'])
+    def attachment(self, request, pk=None):
+        # get_queryset already limits students to their own work and teachers to their classrooms
+        submission = self.get_object()
+        if not submission.attachment or not submission.attachment.storage.exists(submission.attachment.name):
+            return Response({"error": "This submission has no attachment"}, status=404)
+        return serve_file(request, submission.attachment.storage, submission.attachment.name)
 
     @action(detail=False, methods=['get'])
     def pending(self, request):
@@ -49,16 +142,160 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         if user.role != 'teacher':
             return Response({"error": "Only teachers can view pending submissions"}, status=403)
         
-        submissions = Submission.objects.filter(
-            assignment__classroom__teacher=user,
-            grade__isnull=True
-        )
+        submissions = Submission.pending_for_teacher(user)
         return Response(SubmissionSerializer(submissions, many=True).data)
 
+    @action(detail=False, methods=['get'])
+    def queue(self, request):
+        user = request.user
+        if user.role != 'teacher':
+            return Response({"error": "Only teachers can view the grading queue"}, status=403)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 25)), 1), 100)
+        except ValueError:
+            return Response({"error": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+
+        submissions = Submission.pending_for_teacher(user).order_by(
+            F('assignment__due_date').asc(nulls_last=True), 'submitted_at', 'id'
+        )
+        classroom_id = request.query_params.get('classroomId')
+        if classroom_id:
+            try:
+                submissions = submissions.filter(assignment__classroom_id=int(classroom_id))
+            except ValueError:
+                return Response({"error": "classroomId must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            submissions = submissions.filter(after_queue_position(*decode_cursor(cursor)))
+
+        rows = list(submissions.values(
+            'id', 'assignment_id', 'assignment__title', 'assignment__due_date',
+            'student_id', 'student__name', 'submitted_at', 'attachment',
+        )[:limit + 1])
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last['assignment__due_date'], last['submitted_at'], last['id'])
+        return Response({
+            'results': [
+                {
+                    'id': row['id'],
+                    'assignment': row['assignment_id'],
+                    'assignment_title': row['assignment__title'],
+                    'due_date': row['assignment__due_date'],
+                    'student': row['student_id'],
+                    'student_name': row['student__name'],
+                    'submitted_at': row['submitted_at'],
+                    'has_attachment': bool(row['attachment']),
+                }
+                for row in rows
+            ],
+            'next': next_cursor,
+        })
+
     @action(detail=True, methods=['post'])
     def grade(self, request, pk=None):
+        if request.user.role != 'teacher':
+            return Response({"error": "Only teachers can grade submissions"}, status=403)
         submission = self.get_object()
-        submission.grade = request.data.get('grade')
-        submission.feedback = request.data.get('feedback')
+        serializer = GradeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        submission.grade = serializer.validated_data['grade']
+        submission.feedback = serializer.validated_data.get('feedback')
         submission.save()
+        analytics.invalidate_assignments([submission.assignment_id])
+        return Response(SubmissionSerializer(submission).data)
+
+    @action(detail=False, methods=['post'], url_path='batch-grade')
+    def batch_grade(self, request):
+        user = request.user
+        if user.role != 'teacher':
+            return Response({"error": "Only teachers can grade submissions"}, status=403)
+        serializer = BatchGradeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['grades']
+
+        # One query both loads the submissions and checks they belong to this teacher
+        submissions = Submission.objects.filter(
+            id__in={item['submission'] for item in items},
+            assignment__classroom__teacher=user,
+        ).only('id', 'student', 'assignment', 'grade', 'feedback').in_bulk()
+
+        results, graded = [], {}
+        for item in items:
+            submission = submissions.get(item['submission'])
+            if submission is None:
+                results.append({'submission': item['submission'], 'status': 'error', 'error': 'Submission not found'})
+                continue
+            submission.grade = item['grade']
+            if 'feedback' in item:
+                submission.feedback = item['feedback']
+            graded[submission.id] = submission
+            results.append({'submission': submission.id, 'status': 'graded', 'grade': submission.grade})
+
+        if graded:
+            with transaction.atomic():
+                Submission.objects.bulk_update(graded.values(), ['grade', 'feedback'], batch_size=500)
+                GradeSummary.rebuild({submission.student_id for submission in graded.values()})
+            analytics.invalidate_assignments({submission.assignment_id for submission in graded.values()})
+        return Response({'updated': len(graded), 'results': results})
+
+class SubmissionUploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin,
+                              viewsets.GenericViewSet):
+    """
+    Chunked, resumable attachment uploads: POST to start (or resume) one,
+    PUT raw bytes to ``chunk?offset=N``, then POST ``finalize``. GET returns
+    how many bytes have landed so a client can pick up where it left off.
+    """
+    serializer_class = SubmissionUploadSerializer
+
+    def get_queryset(self):
+        return SubmissionUpload.objects.filter(student=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        if request.user.role != 'student':
+            return Response({"error": "Only students can upload submissions"}, status=403)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if not Enrollment.objects.filter(user=request.user, classroom_id=data['assignment'].classroom_id).exists():
+            return Response({"error": "You are not enrolled in this classroom"}, status=403)
+
+        # Starting the same file again resumes the upload already in progress
+        upload = self.get_queryset().filter(
+            assignment=data['assignment'], filename=data['filename'], size=data['size'], checksum=data['checksum'],
+        ).first()
+        if upload is not None:
+            return Response(self.get_serializer(upload).data)
+        upload = serializer.save(student=request.user)
+        return Response(self.get_serializer(upload).data, status=status.HTTP_201_CREATED)
+
+    def perform_destroy(self, instance):
+        uploads.discard(instance)
+        instance.delete()
+
+    @action(detail=True, methods=['put'])
+    def chunk(self, request, pk=None):
+        upload = self.get_object()
+        try:
+            offset = int(request.query_params.get('offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return Response({"error": "offset must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        # Read the raw body straight off the socket; touching request.data
+        # would hand the whole chunk to a parser first
+        try:
+            received = uploads.write_chunk(upload, offset, request.stream, length)
+        except uploads.UploadError as error:
+            return Response({"error": str(error), "received": upload.received}, status=error.status)
+        return Response({'id': upload.id, 'received': received, 'size': upload.size})
+
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        upload = self.get_object()
+        try:
+            submission = uploads.finalize(upload, request.data.get('content'))
+        except uploads.UploadError as error:
+            return Response({"error": str(error)}, status=error.status)
         return Response(SubmissionSerializer(submission).data)
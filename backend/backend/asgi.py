@@ -2,6 +2,8 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Chat push connections (Server-Sent Events and WebSocket) are answered here
+directly; everything else goes to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -13,4 +15,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up
+from messaging import push  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == push.STREAM_PATH:
+        return await push.event_stream(scope, receive, send)
+    if scope['type'] == 'websocket':
+        if scope['path'] == push.WEBSOCKET_PATH:
+            return await push.websocket(scope, receive, send)
+        await receive()
+        return await send({'type': 'websocket.close', 'code': 4404})
+    return await django_application(scope, receive, send)
@@ -0,0 +1,37 @@
+"""
+Opaque cursors for keyset pagination. A cursor is the sort key of the last
+row on a page, JSON-encoded and base64'd so clients pass it back as-is;
+``decode`` checks each value with the parser given for its position, and any
+malformed or tampered cursor becomes a 400.
+"""
+import base64
+import json
+
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+
+def encode(*values):
+    payload = json.dumps(values, default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode(cursor, *parsers):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(parsers):
+            raise ValueError('Wrong number of cursor values')
+        return tuple(parse(value) for parse, value in zip(parsers, values))
+    except (TypeError, ValueError):
+        raise ValidationError({'cursor': 'Invalid cursor'})
+
+
+def timestamp(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f'Not a timestamp: {value!r}')
+    return parsed
+
+
+def optional(parse):
+    return lambda value: None if value is None else parse(value)
@@ -0,0 +1,22 @@
+"""
+Short previews of long text columns for list endpoints. The list queryset
+defers the column and annotates ``<field>_preview`` with its first ``length``
+characters plus one, so the serializer can tell an over-long value was cut
+without the database sending the whole text. Detail endpoints still return
+it in full.
+"""
+from django.db.models.functions import Substr
+
+
+def with_previews(queryset, length, *fields):
+    return queryset.defer(*fields).annotate(**{
+        f'{field}_preview': Substr(field, 1, length + 1) for field in fields
+    })
+
+
+def preview(text, length):
+    return text[:length] if text is not None else None
+
+
+def is_truncated(text, length):
+    return text is not None and len(text) > length
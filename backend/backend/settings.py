@@ -95,7 +95,7 @@ CORS_ALLOW_CREDENTIALS = True
 
 # Additional CORS settings for debugging
 CORS_PREFLIGHT_MAX_AGE = 86400
-CORS_EXPOSE_HEADERS = ['Content-Type', 'Authorization']
+CORS_EXPOSE_HEADERS = ['Content-Type', 'Authorization', 'ETag']
 
 # Additional CORS headers
 CORS_ALLOW_HEADERS = [
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIR = '.blobs'
+BLOCK_SIZE = 64 * 1024
+# Extended attribute holding a blob's digest. Hard links share the inode, so
+# every name linked to the blob carries it too
+DIGEST_ATTRIBUTE = 'user.sha256'
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def tag_digest(path, digest):
+    try:
+        os.setxattr(path, DIGEST_ATTRIBUTE, digest.encode())
+    except (AttributeError, OSError):
+        # No xattrs on this platform or filesystem
+        pass
+
+
+def tagged_digest(path):
+    try:
+        return os.getxattr(path, DIGEST_ATTRIBUTE).decode()
+    except (AttributeError, OSError):
+        return None
+
+
+@deconstructible
+class DedupFileSystemStorage(FileSystemStorage):
+    """
+    FileSystemStorage that keeps one copy of each distinct file. Content is
+    written once to ``.blobs/<sha256>`` and every saved name is a hard link to
+    that blob, so the filesystem's link count is the reference count: names
+    keep working on their own, and a blob is removed once the last name
+    pointing at it is deleted. Blobs are tagged with their digest so a delete
+    can find one without reading the file; where that isn't possible the
+    blob is left for ``dedupe_media`` to sweep up.
+    """
+
+    def blob_name(self, digest, name):
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(BLOB_DIR, digest[:2], f'{digest}{extension}')
+
+    def references(self, name):
+        """How many saved names share this file's blob (1 if it isn't deduplicated)."""
+        links = os.stat(self.path(name)).st_nlink
+        return links - 1 if links > 1 else 1
+
+    def _save(self, name, content):
+        os.makedirs(self.path(BLOB_DIR), exist_ok=True)
+        if hasattr(content, 'temporary_file_path'):
+            # Already on disk; hash it where it is rather than copying first
+            source, staged = content.temporary_file_path(), None
+            digest = file_digest(source)
+        else:
+            descriptor, staged = tempfile.mkstemp(dir=self.path(BLOB_DIR), suffix='.tmp')
+            hasher = hashlib.sha256()
+            with os.fdopen(descriptor, 'wb') as target:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    target.write(chunk)
+            source, digest = staged, hasher.hexdigest()
+
+        blob = self.path(self.blob_name(digest, name))
+        try:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            try:
+                os.link(source, blob)
+            except FileExistsError:
+                pass
+            except OSError:
+                # No hard links here (or across devices); store a plain copy
+                shutil.copyfile(source, blob)
+            tag_digest(blob, digest)
+            return self._link(blob, name)
+        finally:
+            if staged:
+                os.remove(staged)
+
+    def _link(self, blob, name):
+        while True:
+            full_path = self.path(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            try:
+                os.link(blob, full_path)
+            except FileExistsError:
+                name = self.get_available_name(name)
+                continue
+            except OSError:
+                shutil.copyfile(blob, full_path)
+            break
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return str(name).replace('\\', '/')
+
+    def delete(self, name):
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        path = self.path(name)
+        try:
+            links = os.stat(path).st_nlink
+        except FileNotFoundError:
+            return
+        # Two links means this name and its blob; the blob goes with it
+        digest = tagged_digest(path) if links == 2 else None
+        blob = self.path(self.blob_name(digest, name)) if digest else None
+        super().delete(name)
+        if blob and os.path.exists(blob) and os.stat(blob).st_nlink == 1:
+            os.remove(blob)
+
+
+def dedup_storage():
+    return DedupFileSystemStorage()
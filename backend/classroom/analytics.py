@@ -0,0 +1,104 @@
+import numpy as np
+from django.core.cache import cache
+
+from assignments.models import Submission
+from .models import AnalyticsVersion
+
+CACHE_TIMEOUT = 60 * 60
+PERCENTILES = [10, 25, 50, 75, 90]
+HISTOGRAM_BINS = 10
+
+def assignment_key(assignment_id):
+    return f'grade-analytics:assignment:{assignment_id}'
+
+def grades_key(classroom_id):
+    return f'grade-analytics:grades:{classroom_id}'
+
+def invalidate_assignments(assignment_ids):
+    AnalyticsVersion.bump(assignment_key(assignment_id) for assignment_id in assignment_ids)
+
+def invalidate_grades(classroom_id):
+    AnalyticsVersion.bump([grades_key(classroom_id)])
+
+def versioned(keys):
+    """Map each key to the cache key for its current version in the database."""
+    versions = AnalyticsVersion.current(keys)
+    return {key: f'{key}:v{versions.get(key, 0)}' for key in keys}
+
+def group_scores(keys, scores):
+    """Split ``scores`` into one array per distinct key with a single sort."""
+    if len(keys) == 0:
+        return {}
+    order = np.argsort(keys, kind='stable')
+    unique, starts = np.unique(keys[order], return_index=True)
+    return dict(zip(unique.tolist(), np.split(scores[order], starts[1:])))
+
+def score_stats(scores, max_score):
+    """Summary statistics and a histogram over [0, max_score] for a flat array of scores."""
+    scores = np.asarray(scores, dtype=float)
+    if scores.size == 0:
+        return {'count': 0}
+    percentiles = np.percentile(scores, PERCENTILES)
+    upper = max(float(max_score), float(scores.max()))
+    counts, edges = np.histogram(scores, bins=HISTOGRAM_BINS, range=(0, upper))
+    return {
+        'count': int(scores.size),
+        'mean': round(float(scores.mean()), 2),
+        'median': round(float(percentiles[PERCENTILES.index(50)]), 2),
+        'std': round(float(scores.std()), 2),
+        'min': float(scores.min()),
+        'max': float(scores.max()),
+        'percentiles': {str(p): round(float(v), 2) for p, v in zip(PERCENTILES, percentiles)},
+        'histogram': {'counts': counts.tolist(), 'edges': [round(float(edge), 2) for edge in edges]},
+    }
+
+def classroom_analytics(classroom):
+    """
+    Per-assignment and per-Grade-title statistics for a classroom. Each
+    assignment's result is cached on its own under its current
+    AnalyticsVersion; only the ones missing from the cache are recomputed,
+    from a single flat query.
+    """
+    assignments = list(classroom.assignments.order_by('due_date', 'id').values_list('id', 'title', 'points'))
+    keys = versioned([assignment_key(assignment_id) for assignment_id, title, points in assignments] + [grades_key(classroom.id)])
+    cached = cache.get_many(list(keys.values()))
+
+    missing = [assignment for assignment in assignments if keys[assignment_key(assignment[0])] not in cached]
+    if missing:
+        rows = np.array(
+            Submission.objects.filter(
+                assignment_id__in=[assignment_id for assignment_id, title, points in missing], grade__isnull=False
+            ).values_list('assignment_id', 'grade'),
+            dtype=float,
+        ).reshape(-1, 2)
+        by_assignment = group_scores(rows[:, 0].astype(int), rows[:, 1])
+        fresh = {
+            keys[assignment_key(assignment_id)]: score_stats(by_assignment.get(assignment_id, []), points)
+            for assignment_id, title, points in missing
+        }
+        cache.set_many(fresh, CACHE_TIMEOUT)
+        cached.update(fresh)
+
+    grades = cached.get(keys[grades_key(classroom.id)])
+    if grades is None:
+        records = list(classroom.grades.values_list('title', 'score', 'max_score'))
+        titles = np.array([title for title, score, max_score in records], dtype=str)
+        values = np.array([(score, max_score) for title, score, max_score in records], dtype=float).reshape(-1, 2)
+        percents = np.divide(values[:, 0] * 100, values[:, 1], out=np.zeros(len(values)), where=values[:, 1] != 0)
+        grades = {
+            'overall': score_stats(percents, 100),
+            'by_title': {
+                title: score_stats(scores, 100)
+                for title, scores in group_scores(titles, percents).items()
+            },
+        }
+        cache.set(keys[grades_key(classroom.id)], grades, CACHE_TIMEOUT)
+
+    return {
+        'classroom': classroom.id,
+        'assignments': [
+            {'id': assignment_id, 'title': title, 'points': points, **cached[keys[assignment_key(assignment_id)]]}
+            for assignment_id, title, points in assignments
+        ],
+        'grades': grades,
+    }
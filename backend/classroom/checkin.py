@@ -0,0 +1,133 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import Attendance, CheckInSession, Enrollment
+
+logger = logging.getLogger(__name__)
+
+
+class CheckInBuffer:
+    """
+    Collects self check-ins in memory and writes them as one batched insert
+    every ``interval`` seconds, or as soon as ``max_batch`` are waiting.
+    Repeated check-ins by the same student collapse into a single row, and a
+    status the teacher has already recorded for the day is left alone.
+    """
+
+    def __init__(self, max_batch=200, interval=0.25):
+        self.max_batch = max_batch
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._wakeup = threading.Event()
+        self._worker = None
+
+    def add(self, user_id, classroom_id, date, status='present'):
+        with self._lock:
+            self._pending[(user_id, classroom_id, date)] = status
+            full = len(self._pending) >= self.max_batch
+            if self._worker is None:
+                self._start()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """
+        Write everything added so far and return how many records were saved.
+        Flushes run one at a time, so once this returns every earlier
+        check-in is committed.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            try:
+                Attendance.bulk_upsert([
+                    Attendance(user_id=user_id, classroom_id=classroom_id, date=date, status=status)
+                    for (user_id, classroom_id, date), status in pending.items()
+                ], overwrite=False)
+            except Exception:
+                # Put the batch back, without clobbering anything newer, so the
+                # next flush retries it
+                with self._lock:
+                    for key, status in pending.items():
+                        self._pending.setdefault(key, status)
+                raise
+            return len(pending)
+
+    def _start(self):
+        self._worker = threading.Thread(target=self._run, name='check-in-flusher', daemon=True)
+        self._worker.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                written = self.flush()
+            except Exception:
+                logger.exception('Failed to flush %d buffered check-ins', len(self._pending))
+                written = 0
+            if written:
+                # Bursts are rare and short; don't keep this thread's
+                # connection open between them
+                connection.close()
+
+
+class OpenSessions:
+    """
+    In-process cache of open check-in sessions and their rosters, so a burst
+    of check-ins is validated without a database round trip per request.
+    """
+
+    def __init__(self):
+        self._sessions = {}
+
+    def add(self, session):
+        # Expired sessions are otherwise only dropped when their code is looked
+        # up again, so clear them out whenever a new one comes in
+        now = timezone.now()
+        for code, (cached, _) in list(self._sessions.items()):
+            if cached.expires_at <= now:
+                self._sessions.pop(code, None)
+        enrolled = set(Enrollment.objects.filter(classroom_id=session.classroom_id).values_list('user_id', flat=True))
+        self._sessions[session.code] = (session, enrolled)
+
+    def get(self, code):
+        entry = self._sessions.get(code)
+        if entry is None:
+            session = CheckInSession.objects.filter(code=code, expires_at__gt=timezone.now()).first()
+            if session is None:
+                return None
+            self.add(session)
+            entry = self._sessions[code]
+        if entry[0].expires_at <= timezone.now():
+            self._sessions.pop(code, None)
+            return None
+        return entry[0]
+
+    def is_enrolled(self, session, user_id):
+        entry = self._sessions.get(session.code)
+        if entry and user_id in entry[1]:
+            return True
+        # The student may have joined after the session opened
+        if Enrollment.objects.filter(classroom_id=session.classroom_id, user_id=user_id).exists():
+            if entry:
+                entry[1].add(user_id)
+            return True
+        return False
+
+
+check_in_buffer = CheckInBuffer(
+    max_batch=getattr(settings, 'CHECK_IN_BATCH_SIZE', 200),
+    interval=getattr(settings, 'CHECK_IN_FLUSH_INTERVAL', 0.25),
+)
+open_sessions = OpenSessions()
@@ -0,0 +1,93 @@
+import numpy as np
+from django.db import transaction
+
+from assignments.models import Submission
+from . import analytics
+from .models import Grade, GradeSummary
+
+METHODS = ['none', 'linear', 'sqrt', 'target']
+DEFAULT_CUTOFFS = {'A': 90, 'B': 80, 'C': 70, 'D': 60}
+
+def curve_percents(percents, groups, method, target_mean=75, target_std=10):
+    """
+    Curve percentage scores. ``groups`` labels each score with the item it
+    belongs to (an assignment or Grade title) so relative methods work per item.
+    """
+    curved = percents.copy()
+    if method == 'sqrt':
+        curved = 10 * np.sqrt(np.clip(percents, 0, None))
+    elif method in ('linear', 'target'):
+        order = np.argsort(groups, kind='stable')
+        _, starts = np.unique(groups[order], return_index=True)
+        for indices in np.split(order, starts[1:]):
+            scores = percents[indices]
+            if method == 'linear':
+                top = scores.max()
+                curved[indices] = scores * (100 / top) if top > 0 else scores
+            else:
+                std = scores.std()
+                centred = (scores - scores.mean()) / std * target_std if std > 0 else scores - scores.mean()
+                curved[indices] = target_mean + centred
+    return np.clip(curved, 0, 100)
+
+def letters_for(percents, cutoffs):
+    """Letter for each percentage using ``{letter: minimum}`` cutoffs; anything lower is an F."""
+    ordered = sorted(cutoffs.items(), key=lambda item: item[1])
+    bounds = np.array([minimum for letter, minimum in ordered], dtype=float)
+    labels = np.array(['F'] + [letter for letter, minimum in ordered])
+    return labels[np.searchsorted(bounds, percents, side='right')]
+
+def curve_classroom(classroom, method, target_mean=75, target_std=10, cutoffs=None, apply=False):
+    """
+    Curve every Grade and graded Submission in the classroom. With
+    ``apply=False`` this only previews; otherwise the new scores (and Grade
+    letters) are written with one bulk_update per model.
+    """
+    cutoffs = cutoffs or DEFAULT_CUTOFFS
+    grades = list(classroom.grades.only('id', 'user', 'title', 'score', 'max_score', 'grade_letter'))
+    submissions = list(
+        Submission.objects.filter(assignment__classroom=classroom, grade__isnull=False)
+        .select_related('assignment')
+        .only('id', 'student', 'grade', 'assignment', 'assignment__points')
+    )
+
+    maxima = np.array(
+        [grade.max_score for grade in grades] + [submission.assignment.points for submission in submissions], dtype=float
+    )
+    before = np.array([grade.score for grade in grades] + [submission.grade for submission in submissions], dtype=float)
+    groups = np.array(
+        [f'grade:{grade.title}' for grade in grades] + [f'assignment:{submission.assignment_id}' for submission in submissions],
+        dtype=str,
+    )
+    percents = np.divide(before * 100, maxima, out=np.zeros(len(before)), where=maxima > 0)
+    curved = curve_percents(percents, groups, method, target_mean, target_std) if len(percents) else percents
+    after = np.round(curved * maxima / 100, 2)
+    letters = letters_for(curved, cutoffs)
+
+    split = len(grades)
+    if apply:
+        for grade, score, letter in zip(grades, after[:split], letters[:split]):
+            grade.score = float(score)
+            grade.grade_letter = str(letter)
+        for submission, score in zip(submissions, after[split:]):
+            submission.grade = float(score)
+        with transaction.atomic():
+            Grade.objects.bulk_update(grades, ['score', 'grade_letter'], batch_size=500)
+            Submission.objects.bulk_update(submissions, ['grade'], batch_size=500)
+            GradeSummary.rebuild({grade.user_id for grade in grades} | {submission.student_id for submission in submissions})
+        analytics.invalidate_grades(classroom.id)
+        analytics.invalidate_assignments({submission.assignment_id for submission in submissions})
+
+    return {
+        'classroom': classroom.id,
+        'method': method,
+        'applied': apply,
+        'grades': [
+            {'id': grade.id, 'user': grade.user_id, 'title': grade.title, 'before': float(old), 'after': float(new), 'letter': str(letter)}
+            for grade, old, new, letter in zip(grades, before[:split], after[:split], letters[:split])
+        ],
+        'submissions': [
+            {'id': submission.id, 'student': submission.student_id, 'assignment': submission.assignment_id, 'before': float(old), 'after': float(new), 'letter': str(letter)}
+            for submission, old, new, letter in zip(submissions, before[split:], after[split:], letters[split:])
+        ],
+    }
@@ -0,0 +1,49 @@
+import csv
+import json
+
+class Echo:
+    """File-like object whose write() returns the value, so csv.writer output can be streamed."""
+    def write(self, value):
+        return value
+
+def attendance_matrix(classroom):
+    """
+    Yield ``((user_id, name, email), {date: status})`` for every enrolled
+    student, ordered by user id. Students and attendance rows are read as two
+    chunked cursors in the same order and merged, so only one student's row is
+    held in memory at a time.
+    """
+    students = (
+        classroom.enrollments.order_by('user_id')
+        .values_list('user_id', 'user__name', 'user__email')
+        .iterator(chunk_size=500)
+    )
+    records = (
+        classroom.attendance_records.order_by('user_id', 'date')
+        .values_list('user_id', 'date', 'status')
+        .iterator(chunk_size=2000)
+    )
+    record = next(records, None)
+    for student in students:
+        statuses = {}
+        while record is not None and record[0] <= student[0]:
+            if record[0] == student[0]:
+                statuses[record[1]] = record[2]
+            record = next(records, None)
+        yield student, statuses
+
+def attendance_csv(classroom):
+    dates = list(classroom.attendance_records.order_by('date').values_list('date', flat=True).distinct())
+    writer = csv.writer(Echo())
+    yield writer.writerow(['student_id', 'name', 'email'] + [date.isoformat() for date in dates])
+    for (user_id, name, email), statuses in attendance_matrix(classroom):
+        yield writer.writerow([user_id, name or '', email] + [statuses.get(date, '') for date in dates])
+
+def attendance_ndjson(classroom):
+    for (user_id, name, email), statuses in attendance_matrix(classroom):
+        yield json.dumps({
+            'student_id': user_id,
+            'name': name,
+            'email': email,
+            'attendance': {date.isoformat(): status for date, status in statuses.items()},
+        }) + '\n'
@@ -0,0 +1,66 @@
+from assignments.models import Submission
+
+def build_gradebook(classroom, student_id=None):
+    """
+    Students x gradeable items matrix for a classroom. Columns are the
+    classroom's assignments followed by each distinct Grade title and max
+    score, so every cell in a column is out of that column's max_score; rows
+    are plain lists indexed by column so no per-cell objects are created.
+    """
+    students = classroom.enrollments.order_by('user__name', 'user_id')
+    if student_id is not None:
+        students = students.filter(user_id=student_id)
+    students = list(students.values_list('user_id', 'user__name', 'user__email'))
+
+    columns = [
+        {'type': 'assignment', 'id': assignment_id, 'title': title, 'max_score': points}
+        for assignment_id, title, points in classroom.assignments.order_by('due_date', 'id').values_list('id', 'title', 'points')
+    ]
+    column_index = {('assignment', column['id']): index for index, column in enumerate(columns)}
+
+    row_index = {user_id: index for index, (user_id, name, email) in enumerate(students)}
+    rows = [[None] * len(columns) for _ in students]
+
+    submissions = Submission.objects.filter(
+        assignment__classroom=classroom, student_id__in=row_index, grade__isnull=False
+    ).values_list('student_id', 'assignment_id', 'grade')
+    for user_id, assignment_id, grade in submissions:
+        rows[row_index[user_id]][column_index[('assignment', assignment_id)]] = grade
+
+    grades = classroom.grades.filter(user_id__in=row_index).order_by('id').values_list('user_id', 'title', 'score', 'max_score')
+    for user_id, title, score, max_score in grades:
+        key = ('grade', title, max_score)
+        if key not in column_index:
+            column_index[key] = len(columns)
+            columns.append({'type': 'grade', 'id': None, 'title': title, 'max_score': max_score})
+            for row in rows:
+                row.append(None)
+        rows[row_index[user_id]][column_index[key]] = score
+
+    max_scores = [column['max_score'] for column in columns]
+    student_rows = []
+    for (user_id, name, email), scores in zip(students, rows):
+        earned = sum(score for score in scores if score is not None)
+        possible = sum(max_score for score, max_score in zip(scores, max_scores) if score is not None)
+        student_rows.append({
+            'student': {'id': user_id, 'name': name, 'email': email},
+            'scores': scores,
+            'earned': earned,
+            'possible': possible,
+            'percentage': round(earned / possible * 100, 1) if possible else None,
+        })
+
+    column_totals = []
+    for index in range(len(columns)):
+        scores = [row[index] for row in rows if row[index] is not None]
+        column_totals.append({
+            'graded': len(scores),
+            'average': round(sum(scores) / len(scores), 2) if scores else None,
+        })
+
+    return {
+        'classroom': classroom.id,
+        'columns': columns,
+        'rows': student_rows,
+        'column_totals': column_totals,
+    }
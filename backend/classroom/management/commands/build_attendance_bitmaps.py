@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from classroom.models import Attendance, AttendanceBitmap, term_start_for
+
+class Command(BaseCommand):
+    help = 'Rebuild the packed attendance bitmaps from existing Attendance rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        records = Attendance.objects.order_by('user_id', 'classroom_id', 'date').values_list(
+            'user_id', 'classroom_id', 'date', 'status'
+        )
+
+        with transaction.atomic():
+            AttendanceBitmap.objects.all().delete()
+            batch = []
+            current = None
+            rows = bitmaps = 0
+            for user_id, classroom_id, date, status in records.iterator(chunk_size=batch_size):
+                term_start = term_start_for(date)
+                if current is None or (current.user_id, current.classroom_id, current.term_start) != (user_id, classroom_id, term_start):
+                    # Rows arrive grouped by bitmap, so everything before the
+                    # new one is complete and can be written out
+                    if len(batch) >= batch_size:
+                        AttendanceBitmap.objects.bulk_create(batch)
+                        batch = []
+                    current = AttendanceBitmap(user_id=user_id, classroom_id=classroom_id, term_start=term_start)
+                    batch.append(current)
+                    bitmaps += 1
+                current.set_status(date, status)
+                rows += 1
+            AttendanceBitmap.objects.bulk_create(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Packed {rows} attendance rows into {bitmaps} bitmaps')
+        )
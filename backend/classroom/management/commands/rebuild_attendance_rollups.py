@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+from classroom.models import Attendance, AttendanceRollup
+
+class Command(BaseCommand):
+    help = 'Recompute attendance rollups from Attendance rows and repair any drift'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = {
+                (row['user'], row['classroom']): (row['present'], row['absent'], row['late'])
+                for row in Attendance.objects.values('user', 'classroom').annotate(
+                    present=Count('pk', filter=Q(status='present')),
+                    absent=Count('pk', filter=Q(status='absent')),
+                    late=Count('pk', filter=Q(status='late')),
+                ).order_by()
+            }
+            existing = {
+                (rollup.user_id, rollup.classroom_id): rollup
+                for rollup in AttendanceRollup.objects.select_for_update()
+            }
+
+            created, updated = [], []
+            for key, (present, absent, late) in expected.items():
+                rollup = existing.pop(key, None)
+                if rollup is None:
+                    created.append(AttendanceRollup(user_id=key[0], classroom_id=key[1], present=present, absent=absent, late=late))
+                elif (rollup.present, rollup.absent, rollup.late) != (present, absent, late):
+                    rollup.present, rollup.absent, rollup.late = present, absent, late
+                    updated.append(rollup)
+
+            AttendanceRollup.objects.bulk_create(created)
+            AttendanceRollup.objects.bulk_update(updated, ['present', 'absent', 'late'])
+            # Anything left has no attendance rows behind it any more
+            AttendanceRollup.objects.filter(pk__in=[rollup.pk for rollup in existing.values()]).delete()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rollups reconciled: {len(created)} created, {len(updated)} corrected, {len(existing)} removed'
+            )
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from classroom.models import GradeSummary
+
+class Command(BaseCommand):
+    help = 'Recompute every student grade summary from Grade and Submission rows'
+
+    def handle(self, *args, **options):
+        created, updated = GradeSummary.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Grade summaries rebuilt: {created} created, {updated} refreshed')
+        )
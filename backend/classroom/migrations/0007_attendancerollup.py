@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_rollups(apps, schema_editor):
+    Attendance = apps.get_model('classroom', 'Attendance')
+    AttendanceRollup = apps.get_model('classroom', 'AttendanceRollup')
+    rows = Attendance.objects.values('user', 'classroom').annotate(
+        present=Count('pk', filter=Q(status='present')),
+        absent=Count('pk', filter=Q(status='absent')),
+        late=Count('pk', filter=Q(status='late')),
+    ).order_by()
+    AttendanceRollup.objects.bulk_create(
+        AttendanceRollup(
+            user_id=row['user'],
+            classroom_id=row['classroom'],
+            present=row['present'],
+            absent=row['absent'],
+            late=row['late'],
+        )
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0006_attendancebitmap'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('present', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('late', models.IntegerField(default=0)),
+                ('classroom', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to='classroom.classroom')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'classroom')},
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:48
+
+import classroom.models
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0007_attendancerollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckInSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(default=classroom.models.generate_class_code, max_length=10, unique=True)),
+                ('date', models.DateField(default=django.utils.timezone.localdate)),
+                ('opened_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+                ('classroom', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='check_in_sessions', to='classroom.classroom')),
+            ],
+        ),
+    ]
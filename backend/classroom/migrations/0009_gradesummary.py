@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+GPA_SCALE = [(90, 4.0), (80, 3.0), (70, 2.0), (60, 1.0)]
+
+
+def populate_summaries(apps, schema_editor):
+    Grade = apps.get_model('classroom', 'Grade')
+    Submission = apps.get_model('assignments', 'Submission')
+    GradeSummary = apps.get_model('classroom', 'GradeSummary')
+
+    totals = {}
+    rows = list(Grade.objects.values_list('user_id', 'score', 'max_score')) + list(
+        Submission.objects.filter(grade__isnull=False).values_list('student_id', 'grade', 'assignment__points')
+    )
+    for user_id, score, max_score in rows:
+        percent = score / max_score * 100 if max_score else 0
+        points = next((points for minimum, points in GPA_SCALE if percent >= minimum), 0.0)
+        total = totals.setdefault(user_id, [0.0, 0.0, 0.0, 0])
+        total[0] += score
+        total[1] += max_score
+        total[2] += points * max_score
+        total[3] += 1
+    GradeSummary.objects.bulk_create(
+        GradeSummary(user_id=user_id, earned=earned, possible=possible, grade_points=grade_points, graded_items=items)
+        for user_id, (earned, possible, grade_points, items) in totals.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0003_initial'),
+        ('classroom', '0008_checkinsession'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradeSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('earned', models.FloatField(default=0)),
+                ('possible', models.FloatField(default=0)),
+                ('grade_points', models.FloatField(default=0)),
+                ('graded_items', models.IntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='grade_summary', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
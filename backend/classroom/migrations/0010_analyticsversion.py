@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0009_gradesummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('version', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -1,5 +1,10 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.conf import settings
+from django.utils import timezone
 from courses.models import Course
 import random
 import string
@@ -7,6 +12,20 @@ import string
 def generate_class_code():
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=7))
 
+GPA_SCALE = [(90, 4.0), (80, 3.0), (70, 2.0), (60, 1.0)]
+
+def grade_points(score, max_score):
+    """4.0-scale points for a single score."""
+    percent = score / max_score * 100 if max_score else 0
+    for minimum, points in GPA_SCALE:
+        if percent >= minimum:
+            return points
+    return 0.0
+
+def term_start_for(date):
+    """First day of the half-year term (January or July) containing ``date``."""
+    return date.replace(month=1 if date.month < 7 else 7, day=1)
+
 class Classroom(models.Model):
     name = models.CharField(max_length=255)
     section = models.CharField(max_length=100, null=True, blank=True)
@@ -37,10 +56,12 @@ class Announcement(models.Model):
         return self.title
 
 class Attendance(models.Model):
+    STATUS_CHOICES = [('present', 'Present'), ('absent', 'Absent'), ('late', 'Late')]
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='attendance_records')
     classroom = models.ForeignKey(Classroom, on_delete=models.CASCADE, related_name='attendance_records')
     date = models.DateField()
-    status = models.CharField(max_length=10, choices=[('present', 'Present'), ('absent', 'Absent'), ('late', 'Late')])
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
     
     class Meta:
         unique_together = ('user', 'classroom', 'date')
@@ -48,6 +69,208 @@ class Attendance(models.Model):
     def __str__(self):
         return f"{self.user.name or self.user.username} - {self.date} - {self.status}"
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            keys = {(self.user_id, self.classroom_id, self.date)}
+            if self.pk:
+                # The row may be moving to another student or day; that key needs updating too
+                keys.update(Attendance.objects.select_for_update().filter(pk=self.pk).values_list('user_id', 'classroom_id', 'date'))
+            super().save(*args, **kwargs)
+            Attendance.sync_derived(keys)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            Attendance.sync_derived([(self.user_id, self.classroom_id, self.date)])
+        return result
+
+    @classmethod
+    def bulk_upsert(cls, records, overwrite=True):
+        """
+        Insert many records in one statement. Existing rows get the new
+        status, or with ``overwrite=False`` are left as they are.
+        """
+        with transaction.atomic():
+            if overwrite:
+                saved = cls.objects.bulk_create(
+                    records,
+                    update_conflicts=True,
+                    unique_fields=['user', 'classroom', 'date'],
+                    update_fields=['status'],
+                )
+            else:
+                saved = cls.objects.bulk_create(records, ignore_conflicts=True)
+            cls.sync_derived((r.user_id, r.classroom_id, r.date) for r in records)
+        return saved
+
+    @staticmethod
+    def sync_derived(keys):
+        """
+        Bring the attendance bitmaps and rollups for ``(user_id, classroom_id,
+        date)`` keys in line with the Attendance rows as they now stand. Must
+        run in the writer's transaction, after the write: reading back what
+        was actually stored, rather than a status read beforehand, means two
+        writers racing on the same row can't both count it.
+        """
+        keys = set(keys)
+        if not keys:
+            return
+        current = {
+            (user_id, classroom_id, date): status
+            for user_id, classroom_id, date, status in Attendance.objects.filter(
+                user_id__in={key[0] for key in keys},
+                classroom_id__in={key[1] for key in keys},
+                date__in={key[2] for key in keys},
+            ).values_list('user_id', 'classroom_id', 'date', 'status')
+        }
+        AttendanceBitmap.apply((*key, current.get(key)) for key in keys)
+        AttendanceRollup.recount({key[:2] for key in keys})
+
+class CheckInSession(models.Model):
+    """A short-lived code students use to mark themselves present in a classroom."""
+    classroom = models.ForeignKey(Classroom, on_delete=models.CASCADE, related_name='check_in_sessions')
+    code = models.CharField(max_length=10, unique=True, default=generate_class_code)
+    date = models.DateField(default=timezone.localdate)
+    opened_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.classroom} - {self.code}"
+
+class AttendanceBitmap(models.Model):
+    """
+    One student's attendance in one classroom for a term, packed two bits per
+    day counted from ``term_start``: 00 no record, 01 present, 10 absent, 11 late.
+    """
+    STATUS_CODES = {'present': 0b01, 'absent': 0b10, 'late': 0b11}
+    STATUS_LETTERS = '-PAL'
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='attendance_bitmaps')
+    classroom = models.ForeignKey(Classroom, on_delete=models.CASCADE, related_name='attendance_bitmaps')
+    term_start = models.DateField()
+    days = models.BinaryField(default=bytes)
+
+    class Meta:
+        unique_together = ('user', 'classroom', 'term_start')
+
+    def __str__(self):
+        return f"{self.user_id} - {self.classroom_id} - {self.term_start}"
+
+    def _packed(self):
+        return int.from_bytes(bytes(self.days), 'little')
+
+    def _masks(self):
+        # Split the packed days into the low and high bit of each day, both
+        # aligned on the even bit positions so they can be combined directly
+        packed = self._packed()
+        even = int.from_bytes(b'\x55' * len(bytes(self.days)), 'little')
+        return packed & even, (packed >> 1) & even
+
+    def set_status(self, date, status):
+        shift = 2 * (date - self.term_start).days
+        packed = self._packed() & ~(0b11 << shift)
+        if status:
+            packed |= self.STATUS_CODES[status] << shift
+        self.days = packed.to_bytes((packed.bit_length() + 7) // 8, 'little')
+
+    def status_on(self, date):
+        code = (self._packed() >> 2 * (date - self.term_start).days) & 0b11
+        return {v: k for k, v in self.STATUS_CODES.items()}.get(code)
+
+    def counts(self):
+        low, high = self._masks()
+        return {
+            'present': (low & ~high).bit_count(),
+            'absent': (high & ~low).bit_count(),
+            'late': (low & high).bit_count(),
+        }
+
+    def streak(self):
+        """Number of consecutive recorded days marked present, ending at the latest one."""
+        low, high = self._masks()
+        present = low & ~high
+        broken = (low | high) & ~present
+        if not broken:
+            return present.bit_count()
+        return (present >> broken.bit_length()).bit_count()
+
+    def timeline(self):
+        packed = self._packed()
+        return ''.join(
+            self.STATUS_LETTERS[(packed >> 2 * day) & 0b11]
+            for day in range(len(bytes(self.days)) * 4)
+        ).rstrip('-')
+
+    @classmethod
+    def apply(cls, changes):
+        """Apply ``(user_id, classroom_id, date, status)`` changes; a status of None clears the day."""
+        grouped = {}
+        for user_id, classroom_id, date, status in changes:
+            key = (user_id, classroom_id, term_start_for(date))
+            grouped.setdefault(key, []).append((date, status))
+        if not grouped:
+            return
+
+        with transaction.atomic():
+            # Create missing rows first, tolerating a concurrent writer doing the
+            # same, so every bitmap can then be locked before it's rewritten
+            cls.objects.bulk_create(
+                [cls(user_id=key[0], classroom_id=key[1], term_start=key[2]) for key in grouped],
+                ignore_conflicts=True,
+            )
+            bitmaps = [
+                bitmap
+                for bitmap in cls.objects.select_for_update().filter(
+                    user_id__in={key[0] for key in grouped},
+                    classroom_id__in={key[1] for key in grouped},
+                    term_start__in={key[2] for key in grouped},
+                ).order_by('pk')
+                if (bitmap.user_id, bitmap.classroom_id, bitmap.term_start) in grouped
+            ]
+            for bitmap in bitmaps:
+                for date, status in grouped[(bitmap.user_id, bitmap.classroom_id, bitmap.term_start)]:
+                    bitmap.set_status(date, status)
+            cls.objects.bulk_update(bitmaps, ['days'])
+
+class AttendanceRollup(models.Model):
+    """Running attendance totals for one student in one classroom."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='attendance_rollups')
+    classroom = models.ForeignKey(Classroom, on_delete=models.CASCADE, related_name='attendance_rollups')
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+    late = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'classroom')
+
+    def __str__(self):
+        return f"{self.user_id} - {self.classroom_id}: {self.present}/{self.absent}/{self.late}"
+
+    @classmethod
+    def recount(cls, pairs):
+        """
+        Recompute the counters of each ``(user_id, classroom_id)`` pair from
+        its Attendance rows. The rollups are locked before the counting
+        UPDATE runs, so a concurrent writer to the same pair waits for us to
+        commit and then counts our rows too.
+        """
+        pairs = set(pairs)
+        if not pairs:
+            return
+        rollups = cls.objects.filter(user_id__in={pair[0] for pair in pairs}, classroom_id__in={pair[1] for pair in pairs})
+
+        def tally(status):
+            counts = (
+                Attendance.objects.filter(user=OuterRef('user'), classroom=OuterRef('classroom'), status=status)
+                .values('user').annotate(total=Count('pk')).values('total')
+            )
+            return Coalesce(Subquery(counts), 0)
+
+        with transaction.atomic():
+            cls.objects.bulk_create([cls(user_id=user_id, classroom_id=classroom_id) for user_id, classroom_id in pairs], ignore_conflicts=True)
+            list(rollups.select_for_update().order_by('pk').values_list('pk', flat=True))
+            rollups.update(present=tally('present'), absent=tally('absent'), late=tally('late'))
+
 class Grade(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='grades')
     classroom = models.ForeignKey(Classroom, on_delete=models.CASCADE, related_name='grades')
@@ -59,3 +282,157 @@ class Grade(models.Model):
 
     def __str__(self):
         return f"{self.user.name or self.user.username} - {self.title}: {self.score}/{self.max_score}"
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                # Locked so two concurrent edits can't both apply a delta from the same old score
+                previous = Grade.objects.select_for_update().filter(pk=self.pk).values_list('user_id', 'score', 'max_score').first()
+            super().save(*args, **kwargs)
+            if previous and previous[0] != self.user_id:
+                changes = [(previous[0], previous[1:], None), (self.user_id, None, (self.score, self.max_score))]
+            else:
+                changes = [(self.user_id, previous[1:] if previous else None, (self.score, self.max_score))]
+            GradeSummary.apply(changes)
+
+class GradeSummary(models.Model):
+    """
+    Running grade totals for one student across every Grade and graded
+    Submission. ``grade_points`` is the 4.0-scale points of each item
+    weighted by its maximum score, so ``grade_points / possible`` is the GPA.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='grade_summary')
+    earned = models.FloatField(default=0)
+    possible = models.FloatField(default=0)
+    grade_points = models.FloatField(default=0)
+    graded_items = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.earned}/{self.possible}"
+
+    @property
+    def average(self):
+        return self.earned / self.possible * 100 if self.possible else None
+
+    @property
+    def gpa(self):
+        return self.grade_points / self.possible if self.possible else None
+
+    @staticmethod
+    def contribution(score, max_score):
+        return (score, max_score, grade_points(score, max_score) * max_score, 1)
+
+    @classmethod
+    def apply(cls, changes):
+        """Apply ``(user_id, (old_score, old_max) | None, (new_score, new_max) | None)`` changes."""
+        deltas = {}
+        for user_id, old, new in changes:
+            if old == new:
+                continue
+            delta = deltas.setdefault(user_id, [0.0, 0.0, 0.0, 0])
+            if old and old[0] is not None:
+                for index, value in enumerate(cls.contribution(*old)):
+                    delta[index] -= value
+            if new and new[0] is not None:
+                for index, value in enumerate(cls.contribution(*new)):
+                    delta[index] += value
+        deltas = {user_id: delta for user_id, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return
+
+        with transaction.atomic():
+            cls.objects.bulk_create([cls(user_id=user_id) for user_id in deltas], ignore_conflicts=True)
+            for user_id, (earned, possible, points, items) in deltas.items():
+                cls.objects.filter(user_id=user_id).update(
+                    earned=F('earned') + earned,
+                    possible=F('possible') + possible,
+                    grade_points=F('grade_points') + points,
+                    graded_items=F('graded_items') + items,
+                )
+
+    @classmethod
+    def rebuild(cls, user_ids=None):
+        """
+        Recompute summaries from scratch, for every student or just ``user_ids``.
+        Bulk writers (curving, batch grading) use this instead of per-row deltas.
+        """
+        from assignments.models import Submission
+
+        grades = Grade.objects.all()
+        submissions = Submission.objects.filter(grade__isnull=False)
+        summaries = cls.objects.select_for_update()
+        if user_ids is not None:
+            user_ids = set(user_ids)
+            grades = grades.filter(user_id__in=user_ids)
+            submissions = submissions.filter(student_id__in=user_ids)
+            summaries = summaries.filter(user_id__in=user_ids)
+
+        totals = {}
+        rows = list(grades.values_list('user_id', 'score', 'max_score')) + list(
+            submissions.values_list('student_id', 'grade', 'assignment__points')
+        )
+        for user_id, score, max_score in rows:
+            total = totals.setdefault(user_id, [0.0, 0.0, 0.0, 0])
+            for index, value in enumerate(cls.contribution(score, max_score)):
+                total[index] += value
+
+        with transaction.atomic():
+            existing = {summary.user_id: summary for summary in summaries}
+            created, updated = [], []
+            for user_id in set(totals) | set(existing):
+                earned, possible, points, items = totals.get(user_id, (0.0, 0.0, 0.0, 0))
+                summary = existing.get(user_id)
+                if summary is None:
+                    created.append(cls(user_id=user_id, earned=earned, possible=possible, grade_points=points, graded_items=items))
+                else:
+                    summary.earned, summary.possible, summary.grade_points, summary.graded_items = earned, possible, points, items
+                    updated.append(summary)
+            cls.objects.bulk_create(created)
+            cls.objects.bulk_update(updated, ['earned', 'possible', 'grade_points', 'graded_items'], batch_size=500)
+        return len(created), len(updated)
+
+
+class AnalyticsVersion(models.Model):
+    """
+    Generation counter for one cached grade analytics entry. The cache is
+    per process, so a delete only reaches the worker that made it; keys carry
+    this version instead, and bumping it here makes every worker miss.
+    """
+    key = models.CharField(max_length=100, unique=True)
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key}: {self.version}"
+
+    @classmethod
+    def current(cls, keys):
+        return dict(cls.objects.filter(key__in=keys).values_list('key', 'version'))
+
+    @classmethod
+    def bump(cls, keys):
+        keys = list(keys)
+        cls.objects.bulk_create([cls(key=key) for key in keys], ignore_conflicts=True)
+        cls.objects.filter(key__in=keys).update(version=F('version') + 1)
+
+def deleted_with_user(origin, user_id):
+    """
+    Whether a cascade started from deleting the user ``user_id``, whose own
+    summaries go with them. Deleting anyone else (a teacher taking their
+    classrooms along, say) still has to be counted.
+    """
+    if origin is None:
+        return False
+    if isinstance(origin, models.QuerySet):
+        if origin.model._meta.label != settings.AUTH_USER_MODEL:
+            return False
+        # Dependent rows are deleted before the users, so they're still there to check
+        return origin.filter(pk=user_id).exists()
+    return origin._meta.label == settings.AUTH_USER_MODEL and origin.pk == user_id
+
+@receiver(post_delete, sender=Grade)
+def remove_grade_from_summary(sender, instance, origin=None, **kwargs):
+    # A signal rather than delete() so cascades from classrooms are counted too
+    if deleted_with_user(origin, instance.user_id):
+        return
+    GradeSummary.apply([(instance.user_id, (instance.score, instance.max_score), None)])
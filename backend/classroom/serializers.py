@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import Classroom, Enrollment, Announcement, Attendance, Grade
+from . import curving
+from backend.previews import is_truncated, preview
+from .models import Classroom, Enrollment, Announcement, Attendance, AttendanceBitmap, CheckInSession, Grade
 
 class GradeSerializer(serializers.ModelSerializer):
     user_name = serializers.ReadOnlyField(source='user.name')
@@ -24,7 +26,7 @@ class ClassroomSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Classroom
-        fields = ['id', 'name', 'section', 'code', 'course', 'course_detail', 'teacher', 'created_at', 'enrollments', 'assignments', 'announcements']
+        fields = ['id', 'name', 'section', 'code', 'course', 'course_detail', 'teacher', 'created_at', 'enrollments', 'assignments']
         read_only_fields = ('teacher', 'code')
 
     def create(self, validated_data):
@@ -37,8 +39,22 @@ class ClassroomSerializer(serializers.ModelSerializer):
         # Include assignments
         data['assignments'] = AssignmentSerializer(instance.assignments.all(), many=True).data
         data['createdAt'] = data.pop('created_at')
-        # Remove announcements from this representation to avoid circular issues
-        data.pop('announcements', None)
+        return data
+
+class ClassroomSummarySerializer(serializers.ModelSerializer):
+    course_title = serializers.ReadOnlyField(source='course.title')
+    teacher_name = serializers.ReadOnlyField(source='teacher.name')
+    student_count = serializers.IntegerField(read_only=True)
+    assignment_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Classroom
+        fields = ['id', 'name', 'section', 'code', 'course', 'course_title', 'teacher', 'teacher_name', 'student_count', 'assignment_count', 'created_at']
+        read_only_fields = fields
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['createdAt'] = data.pop('created_at')
         return data
 
 class AnnouncementSerializer(serializers.ModelSerializer):
@@ -55,8 +71,89 @@ class AnnouncementSerializer(serializers.ModelSerializer):
         data['createdAt'] = data.pop('created_at')
         return data
 
+# Characters of announcement text shown in lists
+ANNOUNCEMENT_PREVIEW_LENGTH = 200
+
+class AnnouncementListSerializer(AnnouncementSerializer):
+    content = serializers.SerializerMethodField()
+    content_truncated = serializers.SerializerMethodField()
+
+    class Meta(AnnouncementSerializer.Meta):
+        fields = AnnouncementSerializer.Meta.fields + ['content_truncated']
+
+    def get_content(self, instance):
+        return preview(instance.content_preview, ANNOUNCEMENT_PREVIEW_LENGTH)
+
+    def get_content_truncated(self, instance):
+        return is_truncated(instance.content_preview, ANNOUNCEMENT_PREVIEW_LENGTH)
+
 class AttendanceSerializer(serializers.ModelSerializer):
     user_name = serializers.ReadOnlyField(source='user.name')
     class Meta:
         model = Attendance
         fields = '__all__'
+
+class AttendanceBitmapSerializer(serializers.ModelSerializer):
+    user_name = serializers.ReadOnlyField(source='user.name')
+    days = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AttendanceBitmap
+        fields = ['user', 'user_name', 'classroom', 'term_start', 'days']
+
+    def get_days(self, instance):
+        return instance.timeline()
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        counts = instance.counts()
+        recorded = sum(counts.values())
+        data.update(counts)
+        data['percentage'] = round(counts['present'] / recorded * 100, 1) if recorded else 100
+        data['streak'] = instance.streak()
+        return data
+
+class AttendanceRecordSerializer(serializers.Serializer):
+    user = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=Attendance.STATUS_CHOICES)
+
+class BulkAttendanceSerializer(serializers.Serializer):
+    classroom = serializers.PrimaryKeyRelatedField(queryset=Classroom.objects.all())
+    date = serializers.DateField()
+    records = AttendanceRecordSerializer(many=True, allow_empty=False)
+
+    def validate(self, attrs):
+        classroom = attrs['classroom']
+        if classroom.teacher_id != self.context['request'].user.id:
+            raise serializers.ValidationError({'classroom': 'You do not teach this classroom'})
+        user_ids = {record['user'] for record in attrs['records']}
+        if len(user_ids) != len(attrs['records']):
+            raise serializers.ValidationError({'records': 'Each student may only appear once'})
+        enrolled = set(
+            Enrollment.objects.filter(classroom=classroom, user_id__in=user_ids).values_list('user_id', flat=True)
+        )
+        missing = sorted(user_ids - enrolled)
+        if missing:
+            raise serializers.ValidationError({'records': f'Students not enrolled in this classroom: {missing}'})
+        return attrs
+
+class CheckInSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CheckInSession
+        fields = ['id', 'classroom', 'code', 'date', 'opened_at', 'expires_at']
+        read_only_fields = fields
+
+class CurveSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=curving.METHODS)
+    target_mean = serializers.FloatField(required=False, default=75, min_value=0, max_value=100)
+    target_std = serializers.FloatField(required=False, default=10, min_value=0)
+    cutoffs = serializers.DictField(child=serializers.FloatField(min_value=0, max_value=100), required=False)
+    apply = serializers.BooleanField(required=False, default=False)
+
+    def validate_cutoffs(self, value):
+        # Letters are stored in Grade.grade_letter when the curve is applied
+        max_length = Grade._meta.get_field('grade_letter').max_length
+        invalid = sorted(letter for letter in value if not letter.strip() or len(letter) > max_length)
+        if invalid:
+            raise serializers.ValidationError(f'Letters must be 1 to {max_length} characters: {invalid}')
+        return value
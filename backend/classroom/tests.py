@@ -1,3 +1,317 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from courses.models import Course
+from users.models import User
+from . import analytics
+from .checkin import check_in_buffer, open_sessions
+from assignments.models import Assignment, Submission
+from .models import Attendance, AttendanceBitmap, AttendanceRollup, CheckInSession, Classroom, Enrollment, Grade, GradeSummary
+
+
+class CheckInBurstTests(TransactionTestCase):
+    students = 300
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', email='teacher@example.com', password='pw', role='teacher')
+        course = Course.objects.create(title='Physics', teacher=self.teacher)
+        self.classroom = Classroom.objects.create(name='Physics A', course=course, teacher=self.teacher)
+        self.users = User.objects.bulk_create([
+            User(username=f'student{i}', email=f'student{i}@example.com', role='student')
+            for i in range(self.students)
+        ])
+        Enrollment.objects.bulk_create([Enrollment(user=user, classroom=self.classroom) for user in self.users])
+
+    def open_session(self):
+        client = APIClient()
+        client.force_authenticate(self.teacher)
+        response = client.post(f'/api/classrooms/{self.classroom.id}/check-in-session', {'minutes': 5}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['code']
+
+    def check_in(self, user, code):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post('/api/classrooms/attendance/check-in', {'code': code}, format='json').status_code
+
+    def test_concurrent_check_ins_are_coalesced(self):
+        code = self.open_session()
+        # Every student checks in twice, all at once
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            statuses = list(pool.map(lambda user: self.check_in(user, code), self.users * 2))
+        check_in_buffer.flush()
+
+        self.assertEqual(statuses, [202] * self.students * 2)
+        self.assertEqual(Attendance.objects.filter(classroom=self.classroom, status='present').count(), self.students)
+        self.assertEqual(AttendanceRollup.objects.filter(classroom=self.classroom, present=1).count(), self.students)
+
+    def test_check_in_does_not_overwrite_existing_mark(self):
+        code = self.open_session()
+        today = CheckInSession.objects.get(code=code).date
+        late, absent = self.users[:2]
+        Attendance.bulk_upsert([
+            Attendance(user=late, classroom=self.classroom, date=today, status='late'),
+            Attendance(user=absent, classroom=self.classroom, date=today, status='absent'),
+        ])
+        for user in self.users[:3]:
+            self.assertEqual(self.check_in(user, code), 202)
+        check_in_buffer.flush()
+
+        statuses = dict(Attendance.objects.filter(classroom=self.classroom, date=today).values_list('user_id', 'status'))
+        self.assertEqual(statuses, {late.id: 'late', absent.id: 'absent', self.users[2].id: 'present'})
+        rollup = AttendanceRollup.objects.get(user=late, classroom=self.classroom)
+        self.assertEqual((rollup.present, rollup.late), (0, 1))
+
+    def test_expired_sessions_are_pruned(self):
+        expired = CheckInSession.objects.create(classroom=self.classroom, expires_at=timezone.now() - timedelta(minutes=1))
+        open_sessions._sessions[expired.code] = (expired, set())
+        self.open_session()
+        self.assertNotIn(expired.code, open_sessions._sessions)
+
+    def test_check_in_rejects_unknown_code_and_outsiders(self):
+        code = self.open_session()
+        outsider = User.objects.create_user(username='outsider', email='outsider@example.com', password='pw')
+        self.assertEqual(self.check_in(self.users[0], 'NOPE'), 400)
+        self.assertEqual(self.check_in(outsider, code), 403)
+
+
+class AttendanceBitmapTests(TestCase):
+    def setUp(self):
+        teacher = User.objects.create_user(username='teacher', email='teacher@example.com', password='pw', role='teacher')
+        course = Course.objects.create(title='Physics', teacher=teacher)
+        self.classroom = Classroom.objects.create(name='Physics A', course=course, teacher=teacher)
+        self.student = User.objects.create_user(username='student', email='student@example.com', password='pw')
+
+    def bitmap(self, statuses):
+        bitmap = AttendanceBitmap(user=self.student, classroom=self.classroom, term_start=date(2024, 1, 1))
+        for day, status in statuses.items():
+            bitmap.set_status(bitmap.term_start + timedelta(days=day - 1), status)
+        return bitmap
+
+    def test_counts_and_timeline(self):
+        bitmap = self.bitmap({1: 'present', 2: 'absent', 4: 'late', 5: 'present', 40: 'present'})
+
+        self.assertEqual(bitmap.counts(), {'present': 3, 'absent': 1, 'late': 1})
+        self.assertEqual(bitmap.timeline()[:6], 'PA-LP-')
+        self.assertEqual(bitmap.status_on(date(2024, 2, 9)), 'present')
+        self.assertIsNone(bitmap.status_on(date(2024, 1, 3)))
+
+        bitmap.set_status(date(2024, 2, 9), None)
+        self.assertEqual(bitmap.timeline(), 'PA-LP')
+
+    def test_streak_skips_unrecorded_days_and_stops_at_anything_else(self):
+        self.assertEqual(self.bitmap({}).streak(), 0)
+        self.assertEqual(self.bitmap({1: 'present', 3: 'present'}).streak(), 2)
+        self.assertEqual(self.bitmap({1: 'present', 2: 'late', 3: 'present', 9: 'present'}).streak(), 2)
+        self.assertEqual(self.bitmap({1: 'present', 2: 'present', 3: 'absent'}).streak(), 0)
+
+    def test_history_reports_the_term(self):
+        Attendance.bulk_upsert([
+            Attendance(user=self.student, classroom=self.classroom, date=date(2024, 3, day), status=status)
+            for day, status in [(1, 'present'), (2, 'absent'), (3, 'present'), (4, 'present')]
+        ])
+        client = APIClient()
+        client.force_authenticate(self.student)
+        [row] = client.get('/api/classrooms/attendance/history', {'date': '2024-05-01'}).data
+
+        self.assertEqual(row['term_start'], '2024-01-01')
+        self.assertEqual((row['present'], row['absent'], row['late']), (3, 1, 0))
+        self.assertEqual((row['percentage'], row['streak']), (75.0, 2))
+        self.assertTrue(row['days'].endswith('PAPP'))
+
+
+class AttendanceRollupTests(TestCase):
+    def setUp(self):
+        teacher = User.objects.create_user(username='teacher', email='teacher@example.com', password='pw', role='teacher')
+        course = Course.objects.create(title='Physics', teacher=teacher)
+        self.classroom = Classroom.objects.create(name='Physics A', course=course, teacher=teacher)
+        self.student = User.objects.create_user(username='student', email='student@example.com', password='pw')
+
+    def counts(self):
+        rollup = AttendanceRollup.objects.get(user=self.student, classroom=self.classroom)
+        return rollup.present, rollup.absent, rollup.late
+
+    def record(self, day, status):
+        return Attendance(user=self.student, classroom=self.classroom, date=date(2024, 3, day), status=status)
+
+    def test_rollups_follow_what_was_stored(self):
+        # The same new row written twice, as a check-in flush racing a teacher's mark would
+        Attendance.bulk_upsert([self.record(1, 'present')])
+        Attendance.bulk_upsert([self.record(1, 'present'), self.record(2, 'late')])
+        self.assertEqual(self.counts(), (1, 0, 1))
+
+        Attendance.bulk_upsert([self.record(1, 'absent')])
+        self.assertEqual(self.counts(), (0, 1, 1))
+
+        attendance = Attendance.objects.get(date=date(2024, 3, 2))
+        attendance.date = date(2024, 3, 3)
+        attendance.save()
+        attendance.delete()
+        self.assertEqual(self.counts(), (0, 1, 0))
+        bitmap = AttendanceBitmap.objects.get(user=self.student, classroom=self.classroom)
+        self.assertEqual(bitmap.counts(), {'present': 0, 'absent': 1, 'late': 0})
+
+
+    def test_history_rejects_bad_parameters(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        self.assertEqual(client.get('/api/classrooms/attendance/history', {'date': '2024-02-30'}).status_code, 400)
+        self.assertEqual(client.get('/api/classrooms/attendance/history', {'classroom': 'abc'}).status_code, 400)
+        self.assertEqual(client.get('/api/classrooms/attendance/history', {'date': '2024-03-01'}).status_code, 200)
+
+
+class GradeSummaryDeletionTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', email='teacher@example.com', password='pw', role='teacher')
+        course = Course.objects.create(title='Physics', teacher=self.teacher)
+        classroom = Classroom.objects.create(name='Physics A', course=course, teacher=self.teacher)
+        self.student = User.objects.create_user(username='student', email='student@example.com', password='pw')
+        Grade.objects.create(user=self.student, classroom=classroom, title='Quiz', score=50, max_score=100)
+        assignment = Assignment.objects.create(title='Lab', classroom=classroom, points=100)
+        Submission.objects.create(assignment=assignment, student=self.student, grade=80)
+
+    def test_deleting_teacher_removes_their_classes_from_student_summaries(self):
+        self.assertEqual(GradeSummary.objects.get(user=self.student).possible, 200)
+        self.teacher.delete()
+
+        summary = GradeSummary.objects.get(user=self.student)
+        self.assertEqual((summary.earned, summary.possible, summary.grade_points, summary.graded_items), (0, 0, 0, 0))
+
+    def test_deleting_teacher_through_queryset_updates_student_summaries(self):
+        User.objects.filter(pk=self.teacher.pk).delete()
+        self.assertEqual(GradeSummary.objects.get(user=self.student).graded_items, 0)
+
+    def test_deleting_student_takes_their_summary(self):
+        self.student.delete()
+        self.assertFalse(GradeSummary.objects.exists())
+
+
+class GradeAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='teacher', email='teacher@example.com', password='pw', role='teacher')
+        course = Course.objects.create(title='Physics', teacher=self.teacher)
+        self.classroom = Classroom.objects.create(name='Physics A', course=course, teacher=self.teacher)
+        self.student = User.objects.create_user(username='student', email='student@example.com', password='pw')
+        Enrollment.objects.create(user=self.student, classroom=self.classroom)
+        Grade.objects.create(user=self.student, classroom=self.classroom, title='Quiz', score=50, max_score=100)
+
+    def get_analytics(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(f'/api/classrooms/{self.classroom.id}/analytics')
+
+    def test_students_cannot_read_class_analytics(self):
+        self.assertEqual(self.get_analytics(self.student).status_code, 403)
+
+    def test_teacher_can_read_class_analytics(self):
+        self.assertEqual(self.get_analytics(self.teacher).status_code, 200)
+
+    def test_invalidation_reaches_other_workers_caches(self):
+        stale = self.get_analytics(self.teacher).data['grades']
+        keys = analytics.versioned([analytics.grades_key(self.classroom.id)])
+        client = APIClient()
+        client.force_authenticate(self.teacher)
+        response = client.post('/api/classrooms/grades', {
+            'user': self.student.id, 'classroom': self.classroom.id, 'title': 'Quiz', 'score': 90, 'max_score': 100,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        # Another worker whose local cache still holds the entry from before the change
+        cache.set_many({key: stale for key in keys.values()})
+
+        self.assertEqual(self.get_analytics(self.teacher).data['grades']['overall']['count'], 2)
+
+
+class GradebookTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', email='teacher@example.com', password='pw', role='teacher')
+        course = Course.objects.create(title='Physics', teacher=self.teacher)
+        self.classroom = Classroom.objects.create(name='Physics A', course=course, teacher=self.teacher)
+        self.first = User.objects.create_user(username='first', email='first@example.com', password='pw', name='Ann')
+        self.second = User.objects.create_user(username='second', email='second@example.com', password='pw', name='Ben')
+        for student in (self.first, self.second):
+            Enrollment.objects.create(user=student, classroom=self.classroom)
+        assignment = Assignment.objects.create(title='Lab', classroom=self.classroom, points=50)
+        Submission.objects.create(assignment=assignment, student=self.second, grade=30)
+        Grade.objects.create(user=self.first, classroom=self.classroom, title='Quiz', score=8, max_score=10)
+        Grade.objects.create(user=self.second, classroom=self.classroom, title='Quiz', score=18, max_score=20)
+
+    def get_gradebook(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(f'/api/classrooms/{self.classroom.id}/gradebook')
+
+    def test_totals_use_each_grades_own_max_score(self):
+        data = self.get_gradebook(self.teacher).data
+
+        self.assertEqual([column['max_score'] for column in data['columns']], [50, 10, 20])
+        totals = [(row['student']['id'], row['earned'], row['possible']) for row in data['rows']]
+        self.assertEqual(totals, [(self.first.id, 8, 10), (self.second.id, 48, 70)])
+        self.assertEqual([total['graded'] for total in data['column_totals']], [1, 1, 1])
+
+    def test_students_only_see_their_own_row(self):
+        data = self.get_gradebook(self.first).data
+
+        self.assertEqual([row['student']['id'] for row in data['rows']], [self.first.id])
+        self.assertEqual(data['rows'][0]['percentage'], 80.0)
+
+
+class CurveTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', email='teacher@example.com', password='pw', role='teacher')
+        course = Course.objects.create(title='Physics', teacher=self.teacher)
+        self.classroom = Classroom.objects.create(name='Physics A', course=course, teacher=self.teacher)
+        self.student = User.objects.create_user(username='student', email='student@example.com', password='pw')
+        self.grade = Grade.objects.create(user=self.student, classroom=self.classroom, title='Quiz', score=64, max_score=100)
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def curve(self, **data):
+        return self.client.post(f'/api/classrooms/{self.classroom.id}/curve', data, format='json')
+
+    def test_preview_leaves_grades_alone(self):
+        response = self.curve(method='sqrt')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['applied'])
+        self.assertEqual(
+            [(row['before'], row['after'], row['letter']) for row in response.data['grades']], [(64.0, 80.0, 'B')],
+        )
+        self.grade.refresh_from_db()
+        self.assertEqual((self.grade.score, self.grade.grade_letter), (64, None))
+
+    def test_apply_writes_scores_letters_and_summaries(self):
+        assignment = Assignment.objects.create(title='Lab', classroom=self.classroom, points=50)
+        submission = Submission.objects.create(assignment=assignment, student=self.student, grade=20)
+
+        response = self.curve(method='linear', apply=True, cutoffs={'P': 50})
+
+        self.assertTrue(response.data['applied'])
+        self.grade.refresh_from_db()
+        submission.refresh_from_db()
+        # Linear scales each item so its top score becomes full marks
+        self.assertEqual((self.grade.score, self.grade.grade_letter), (100, 'P'))
+        self.assertEqual(submission.grade, 50)
+        summary = GradeSummary.objects.get(user=self.student)
+        self.assertEqual((summary.earned, summary.possible), (150, 150))
+
+    def test_students_cannot_curve(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        response = client.post(f'/api/classrooms/{self.classroom.id}/curve', {'method': 'sqrt', 'apply': True}, format='json')
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_cutoff_letters_must_fit_a_grade_letter(self):
+        for letter in ['', '  ', 'TOOLONG']:
+            response = self.curve(method='sqrt', apply=True, cutoffs={'A': 90, letter: 50})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('cutoffs', response.data)
+
+        self.grade.refresh_from_db()
+        self.assertEqual((self.grade.score, self.grade.grade_letter), (64, None))
@@ -1,8 +1,40 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from .models import Classroom, Enrollment, Announcement, Attendance, Grade
-from .serializers import ClassroomSerializer, EnrollmentSerializer, AnnouncementSerializer, AttendanceSerializer, GradeSerializer
+from rest_framework.pagination import PageNumberPagination
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from datetime import timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from assignments.models import Assignment
+from .checkin import check_in_buffer, open_sessions
+from . import analytics
+from .curving import curve_classroom
+from .gradebook import build_gradebook
+from .exports import attendance_csv, attendance_ndjson
+from .models import Classroom, Enrollment, Announcement, Attendance, AttendanceBitmap, CheckInSession, Grade, term_start_for
+from backend.previews import with_previews
+from .serializers import ANNOUNCEMENT_PREVIEW_LENGTH, ClassroomSerializer, ClassroomSummarySerializer, EnrollmentSerializer, AnnouncementSerializer, AnnouncementListSerializer, AttendanceSerializer, AttendanceBitmapSerializer, BulkAttendanceSerializer, CheckInSessionSerializer, CurveSerializer, GradeSerializer
+
+def classroom_count(model):
+    """Per-classroom row count of ``model`` as a correlated subquery."""
+    counts = (
+        model.objects.filter(classroom=OuterRef('pk'))
+        .order_by()
+        .values('classroom')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+class RosterPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
 
 class GradeViewSet(viewsets.ModelViewSet):
     serializer_class = GradeSerializer
@@ -13,6 +45,20 @@ class GradeViewSet(viewsets.ModelViewSet):
             return Grade.objects.filter(classroom__teacher=user)
         return Grade.objects.filter(user=user)
 
+    def perform_create(self, serializer):
+        grade = serializer.save()
+        analytics.invalidate_grades(grade.classroom_id)
+
+    def perform_update(self, serializer):
+        previous_classroom_id = serializer.instance.classroom_id
+        grade = serializer.save()
+        analytics.invalidate_grades(previous_classroom_id)
+        analytics.invalidate_grades(grade.classroom_id)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        analytics.invalidate_grades(instance.classroom_id)
+
 class ClassroomViewSet(viewsets.ModelViewSet):
     queryset = Classroom.objects.all()
     serializer_class = ClassroomSerializer
@@ -20,8 +66,88 @@ class ClassroomViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.role == 'teacher':
-            return Classroom.objects.filter(teacher=user)
-        return Classroom.objects.filter(enrollments__user=user)
+            queryset = Classroom.objects.filter(teacher=user)
+        else:
+            queryset = Classroom.objects.filter(id__in=Enrollment.objects.filter(user=user).values('classroom'))
+        if self.action == 'list':
+            return queryset.select_related('course', 'teacher').annotate(
+                student_count=classroom_count(Enrollment),
+                assignment_count=classroom_count(Assignment),
+            )
+        if self.action in ('roster', 'attendance_export', 'open_check_in', 'gradebook', 'grade_analytics', 'curve'):
+            return queryset
+        # Load everything ClassroomSerializer nests up front so the full
+        # representation costs the same number of queries regardless of roster size
+        return queryset.select_related('course', 'teacher').prefetch_related(
+            Prefetch('enrollments', queryset=Enrollment.objects.select_related('user')),
+            'assignments',
+        )
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ClassroomSummarySerializer
+        return ClassroomSerializer
+
+    @action(detail=True, methods=['get'])
+    def roster(self, request, pk=None):
+        classroom = self.get_object()
+        enrollments = classroom.enrollments.select_related('user').order_by('enrolled_at', 'id')
+        paginator = RosterPagination()
+        page = paginator.paginate_queryset(enrollments, request, view=self)
+        return paginator.get_paginated_response(EnrollmentSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def gradebook(self, request, pk=None):
+        classroom = self.get_object()
+        # Students only get their own row
+        student_id = None if request.user.role == 'teacher' else request.user.id
+        return Response(build_gradebook(classroom, student_id=student_id))
+
+    @action(detail=True, methods=['get'], url_path='analytics')
+    def grade_analytics(self, request, pk=None):
+        # Class-wide distributions give away classmates' grades in a small class
+        if request.user.role != 'teacher':
+            return Response({"error": "Only teachers can view grade analytics"}, status=403)
+        return Response(analytics.classroom_analytics(self.get_object()))
+
+    @action(detail=True, methods=['post'])
+    def curve(self, request, pk=None):
+        if request.user.role != 'teacher':
+            return Response({"error": "Only teachers can curve grades"}, status=403)
+        classroom = self.get_object()
+        serializer = CurveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(curve_classroom(classroom, **serializer.validated_data))
+
+    @action(detail=True, methods=['get'], url_path='attendance-export')
+    def attendance_export(self, request, pk=None):
+        if request.user.role != 'teacher':
+            return Response({"error": "Only teachers can export attendance"}, status=403)
+        classroom = self.get_object()
+        if request.query_params.get('output') == 'ndjson':
+            response = StreamingHttpResponse(attendance_ndjson(classroom), content_type='application/x-ndjson')
+            extension = 'ndjson'
+        else:
+            response = StreamingHttpResponse(attendance_csv(classroom), content_type='text/csv')
+            extension = 'csv'
+        response['Content-Disposition'] = f'attachment; filename="attendance-{classroom.code}.{extension}"'
+        return response
+
+    @action(detail=True, methods=['post'], url_path='check-in-session')
+    def open_check_in(self, request, pk=None):
+        if request.user.role != 'teacher':
+            return Response({"error": "Only teachers can open a check-in"}, status=403)
+        classroom = self.get_object()
+        try:
+            minutes = min(max(int(request.data.get('minutes', 10)), 1), 120)
+        except (TypeError, ValueError):
+            return Response({"error": "minutes must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        session = CheckInSession.objects.create(
+            classroom=classroom,
+            expires_at=timezone.now() + timedelta(minutes=minutes),
+        )
+        open_sessions.add(session)
+        return Response(CheckInSessionSerializer(session).data, status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['post'])
     def join(self, request):
@@ -39,8 +165,17 @@ class AnnouncementViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.role == 'teacher':
-            return Announcement.objects.filter(classroom__teacher=user)
-        return Announcement.objects.filter(classroom__enrollments__user=user)
+            queryset = Announcement.objects.filter(classroom__teacher=user)
+        else:
+            queryset = Announcement.objects.filter(classroom__enrollments__user=user)
+        if self.action == 'list':
+            queryset = with_previews(queryset.select_related('author'), ANNOUNCEMENT_PREVIEW_LENGTH, 'content')
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return AnnouncementListSerializer
+        return AnnouncementSerializer
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -53,3 +188,51 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         if user.role == 'teacher':
             return Attendance.objects.filter(classroom__teacher=user)
         return Attendance.objects.filter(user=user)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        if request.user.role != 'teacher':
+            return Response({"error": "Only teachers can mark attendance"}, status=403)
+        serializer = BulkAttendanceSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        classroom = serializer.validated_data['classroom']
+        date = serializer.validated_data['date']
+        records = [
+            Attendance(user_id=record['user'], classroom=classroom, date=date, status=record['status'])
+            for record in serializer.validated_data['records']
+        ]
+        with transaction.atomic():
+            Attendance.bulk_upsert(records)
+        return Response({'classroom': classroom.id, 'date': date, 'saved': len(records)})
+
+    @action(detail=False, methods=['post'], url_path='check-in')
+    def check_in(self, request):
+        session = open_sessions.get(request.data.get('code'))
+        if session is None:
+            return Response({"error": "Invalid or expired check-in code"}, status=status.HTTP_400_BAD_REQUEST)
+        if not open_sessions.is_enrolled(session, request.user.id):
+            return Response({"error": "You are not enrolled in this classroom"}, status=403)
+        # Acknowledge straight away; the buffer writes the row in the next batch
+        check_in_buffer.add(request.user.id, session.classroom_id, session.date)
+        return Response({'classroom': session.classroom_id, 'date': session.date, 'status': 'present'}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'])
+    def history(self, request):
+        user = request.user
+        try:
+            # parse_date returns None for malformed input but raises for impossible dates like 2024-02-30
+            date = parse_date(request.query_params.get('date', '')) or timezone.localdate()
+        except ValueError:
+            raise ValidationError({'date': 'Invalid date'})
+        bitmaps = AttendanceBitmap.objects.filter(term_start=term_start_for(date)).select_related('user')
+        if user.role == 'teacher':
+            bitmaps = bitmaps.filter(classroom__teacher=user)
+        else:
+            bitmaps = bitmaps.filter(user=user)
+        classroom_id = request.query_params.get('classroom')
+        if classroom_id:
+            try:
+                bitmaps = bitmaps.filter(classroom_id=int(classroom_id))
+            except ValueError:
+                raise ValidationError({'classroom': 'classroom must be a number'})
+        return Response(AttendanceBitmapSerializer(bitmaps, many=True).data)
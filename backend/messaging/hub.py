@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """One open push connection: a bounded queue on the event loop that owns it."""
+
+    def __init__(self, user_id, loop, max_pending):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.dropped = False
+
+    def deliver(self, event):
+        # Runs on self.loop. A client that lets this many events pile up is
+        # cut off and reconnects, rather than growing the queue forever
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped = True
+
+
+class Hub:
+    """
+    In-process pub/sub for chat messages. Push connections (see
+    ``messaging.push``) subscribe per user; views publish from any thread and
+    each event is handed to the subscriber's own loop. Nothing leaves the
+    process, so only connections served by this worker see an event.
+    """
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, user_id):
+        # Token claims may carry the id as a string; key everything by str
+        user_id = str(user_id)
+        subscription = Subscription(user_id, asyncio.get_running_loop(), self.max_pending)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def connections(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def publish(self, user_ids, event):
+        """Send ``event`` to every open connection of each user in ``user_ids``; returns how many."""
+        with self._lock:
+            targets = [
+                subscription
+                for user_id in {str(user_id) for user_id in user_ids}
+                for subscription in self._subscriptions.get(user_id, ())
+            ]
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The connection's loop has already shut down
+                self.unsubscribe(subscription)
+        return len(targets)
+
+
+hub = Hub()
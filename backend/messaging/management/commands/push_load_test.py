@@ -0,0 +1,113 @@
+import asyncio
+import json
+import random
+import resource
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from messaging.hub import hub
+
+
+class Command(BaseCommand):
+    help = (
+        'Open thousands of idle chat push connections against the ASGI app in this process, '
+        'publish messages from another thread and report memory and delivery latency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=2500, help='Connections are spread across this many user ids')
+        parser.add_argument('--messages', type=int, default=500)
+        parser.add_argument('--transport', choices=['sse', 'websocket'], default='sse')
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(**options))
+
+    async def run(self, connections, users, messages, transport, **options):
+        from backend.asgi import application
+        from messaging import push
+
+        tokens = {}
+        for user_id in range(1, users + 1):
+            token = AccessToken()
+            token[api_settings.USER_ID_CLAIM] = user_id
+            tokens[user_id] = str(token)
+
+        received = []
+        stop = asyncio.Event()
+
+        def connection(user_id):
+            connected = False
+
+            async def receive():
+                nonlocal connected
+                if transport == 'websocket' and not connected:
+                    connected = True
+                    return {'type': 'websocket.connect'}
+                await stop.wait()
+                return {'type': 'http.disconnect' if transport == 'sse' else 'websocket.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'websocket.send':
+                    payload = json.dumps(json.loads(message['text'])['data'])
+                elif message['type'] == 'http.response.body' and message['body'].startswith(b'id:'):
+                    payload = message['body'].split(b'data: ', 1)[1]
+                else:
+                    return
+                received.append(time.perf_counter() - json.loads(payload)['sent'])
+
+            scope = {
+                'type': 'http' if transport == 'sse' else 'websocket',
+                'path': push.STREAM_PATH if transport == 'sse' else push.WEBSOCKET_PATH,
+                'query_string': f'token={tokens[user_id]}'.encode(),
+                'headers': [],
+            }
+            return application(scope, receive, send)
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        tasks = [asyncio.ensure_future(connection(index % users + 1)) for index in range(connections)]
+        while hub.connections() < connections:
+            await asyncio.sleep(0.01)
+        opened = time.perf_counter() - started
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.stdout.write(
+            f'{connections} {transport} connections open in {opened:.2f}s; '
+            f'peak RSS grew {(rss_after - rss_before) / 1024:.1f} MB '
+            f'(~{(rss_after - rss_before) * 1024 / connections / 1024:.1f} KB each)'
+        )
+
+        # Publish the way MessageViewSet does: from a worker thread, to sender and receiver
+        expected = 0
+
+        def publisher():
+            nonlocal expected
+            for index in range(messages):
+                sender, receiver = random.sample(range(1, users + 1), 2)
+                event = {'id': index, 'data': {'id': index, 'content': 'hi', 'sent': time.perf_counter()}}
+                expected += hub.publish([sender, receiver], event)
+
+        thread = threading.Thread(target=publisher)
+        started = time.perf_counter()
+        thread.start()
+        while thread.is_alive() or len(received) < expected:
+            await asyncio.sleep(0.005)
+            if time.perf_counter() - started > 30:
+                break
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(received)
+        summary = f'{messages} messages -> {len(received)}/{expected} deliveries in {elapsed:.2f}s'
+        if latencies:
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            summary += f'; latency p50 {statistics.median(latencies) * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms'
+        self.stdout.write(summary)
+
+        stop.set()
+        await asyncio.gather(*tasks)
+        self.stdout.write(self.style.SUCCESS(f'All connections closed; {hub.connections()} left subscribed'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from messaging.models import Conversation
+
+class Command(BaseCommand):
+    help = 'Recompute every conversation\'s latest message and unread counts from its messages'
+
+    def handle(self, *args, **options):
+        rebuilt = Conversation.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Conversations rebuilt: {rebuilt}')
+        )
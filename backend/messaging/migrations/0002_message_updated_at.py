@@ -0,0 +1,32 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_timestamps(apps, schema_editor):
+    Message = apps.get_model('messaging', 'Message')
+    Message.objects.update(updated_at=models.F('timestamp'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_timestamps, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'updated_at'], name='message_sender_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['receiver', 'updated_at'], name='message_receiver_updated_idx'),
+        ),
+    ]
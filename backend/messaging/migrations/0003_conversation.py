@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_conversations(apps, schema_editor):
+    Conversation = apps.get_model('messaging', 'Conversation')
+    Message = apps.get_model('messaging', 'Message')
+    pairs = {tuple(sorted(pair)) for pair in Message.objects.values_list('sender', 'receiver').distinct()}
+    Conversation.objects.bulk_create(Conversation(user_a_id=a, user_b_id=b) for a, b in pairs)
+
+    for conversation in Conversation.objects.all():
+        messages = Message.objects.filter(
+            Q(sender=conversation.user_a_id, receiver=conversation.user_b_id)
+            | Q(sender=conversation.user_b_id, receiver=conversation.user_a_id)
+        )
+        messages.update(conversation=conversation)
+        latest = messages.order_by('-id').values_list('id', 'timestamp').first()
+        unread = dict(messages.filter(is_read=False).values('receiver').annotate(unread=Count('pk')).order_by().values_list('receiver', 'unread'))
+        conversation.last_message_id, conversation.last_timestamp = latest or (None, None)
+        conversation.unread_a = unread.get(conversation.user_a_id, 0)
+        conversation.unread_b = unread.get(conversation.user_b_id, 0)
+        conversation.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0002_message_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_timestamp', models.DateTimeField(blank=True, null=True)),
+                ('unread_a', models.IntegerField(default=0)),
+                ('unread_b', models.IntegerField(default=0)),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messaging.message')),
+                ('user_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='conversation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='messaging.conversation'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='conversation',
+            unique_together={('user_a', 'user_b')},
+        ),
+        migrations.RunPython(populate_conversations, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', '-id'], name='message_conversation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user_a', '-last_timestamp', '-id'], name='conversation_user_a_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user_b', '-last_timestamp', '-id'], name='conversation_user_b_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0003_conversation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['receiver', 'is_read'], name='message_receiver_unread_idx'),
+        ),
+    ]
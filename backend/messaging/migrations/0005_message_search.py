@@ -0,0 +1,79 @@
+from django.db import migrations
+
+# SQLite: an FTS5 table keyed by message id, kept in sync by triggers. Each
+# row also indexes its two participants as tokens ("u12 u34") so restricting
+# a search to one user's messages is another posting list to intersect in
+# the index, not a scan of every match.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE messaging_message_fts USING fts5(content, participants, prefix='2 3')
+    """,
+    """
+    INSERT INTO messaging_message_fts (rowid, content, participants)
+    SELECT id, content, 'u' || sender_id || ' u' || receiver_id FROM messaging_message
+    """,
+    """
+    CREATE TRIGGER messaging_message_fts_insert AFTER INSERT ON messaging_message BEGIN
+        INSERT INTO messaging_message_fts (rowid, content, participants)
+        VALUES (new.id, new.content, 'u' || new.sender_id || ' u' || new.receiver_id);
+    END
+    """,
+    """
+    CREATE TRIGGER messaging_message_fts_delete AFTER DELETE ON messaging_message BEGIN
+        DELETE FROM messaging_message_fts WHERE rowid = old.id;
+    END
+    """,
+    # Model.save() writes every column, so only reindex when the text or the
+    # participants actually changed, not each time a message is marked read
+    """
+    CREATE TRIGGER messaging_message_fts_update AFTER UPDATE ON messaging_message
+    WHEN old.content IS NOT new.content OR old.sender_id IS NOT new.sender_id OR old.receiver_id IS NOT new.receiver_id
+    BEGIN
+        UPDATE messaging_message_fts
+        SET content = new.content, participants = 'u' || new.sender_id || ' u' || new.receiver_id
+        WHERE rowid = old.id;
+    END
+    """,
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS messaging_message_fts_update',
+    'DROP TRIGGER IF EXISTS messaging_message_fts_delete',
+    'DROP TRIGGER IF EXISTS messaging_message_fts_insert',
+    'DROP TABLE IF EXISTS messaging_message_fts',
+]
+
+# Postgres keeps a generated tsvector column up to date itself
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE messaging_message
+    ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (to_tsvector('english', content)) STORED
+    """,
+    'CREATE INDEX message_search_vector_idx ON messaging_message USING GIN (search_vector)',
+]
+
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS message_search_vector_idx',
+    'ALTER TABLE messaging_message DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0004_message_receiver_unread_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0005_message_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_id', models.BigIntegerField()),
+                ('sender_id', models.BigIntegerField()),
+                ('receiver_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sender_id', 'deleted_at'], name='deleted_message_sender_idx'), models.Index(fields=['receiver_id', 'deleted_at'], name='deleted_message_receiver_idx')],
+            },
+        ),
+    ]
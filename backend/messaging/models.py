@@ -1,15 +1,201 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.db.models import Case, Count, F, Max, Q, Value, When
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from classroom.models import deleted_with_user
+
+class Conversation(models.Model):
+    """
+    The thread between two users, with its latest message and each side's
+    unread count kept current as messages are sent and read, so the inbox
+    never has to look at Message rows. ``user_a`` is always the lower id.
+    """
+    user_a = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    user_b = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_timestamp = models.DateTimeField(null=True, blank=True)
+    unread_a = models.IntegerField(default=0)
+    unread_b = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user_a', 'user_b')
+        indexes = [
+            # One per side, in inbox order, for keyset pagination
+            models.Index(fields=['user_a', '-last_timestamp', '-id'], name='conversation_user_a_recent_idx'),
+            models.Index(fields=['user_b', '-last_timestamp', '-id'], name='conversation_user_b_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"Conversation between {self.user_a_id} and {self.user_b_id}"
+
+    @staticmethod
+    def unread_field(conversation_user_a_id, user_id):
+        return 'unread_a' if user_id == conversation_user_a_id else 'unread_b'
+
+    @classmethod
+    def for_users(cls, first_id, second_id):
+        user_a_id, user_b_id = sorted((first_id, second_id))
+        conversation, created = cls.objects.get_or_create(user_a_id=user_a_id, user_b_id=user_b_id)
+        return conversation
+
+    @classmethod
+    def for_user(cls, user):
+        return cls.objects.filter(Q(user_a=user) | Q(user_b=user))
+
+    def other_user(self, user_id):
+        return self.user_b if user_id == self.user_a_id else self.user_a
+
+    def unread_for(self, user_id):
+        return self.unread_a if user_id == self.user_a_id else self.unread_b
+
+    @classmethod
+    def record(cls, message):
+        """Make ``message`` the latest one (unless a newer one got there first) and count it as unread."""
+        newer = Q(last_timestamp__isnull=True) | Q(last_timestamp__lte=message.timestamp)
+        changes = {
+            'last_message': Case(When(newer, then=Value(message.id)), default=F('last_message'), output_field=models.BigIntegerField()),
+            'last_timestamp': Case(When(newer, then=Value(message.timestamp)), default=F('last_timestamp'), output_field=models.DateTimeField()),
+        }
+        if not message.is_read:
+            field = 'unread_a' if message.receiver_id == min(message.sender_id, message.receiver_id) else 'unread_b'
+            changes[field] = F(field) + 1
+        cls.objects.filter(pk=message.conversation_id).update(**changes)
+
+    @classmethod
+    def adjust_unread(cls, conversation_id, user_id, amount):
+        conversation = cls.objects.filter(pk=conversation_id).values_list('user_a_id', flat=True).first()
+        if conversation is None:
+            return
+        field = cls.unread_field(conversation, user_id)
+        cls.objects.filter(pk=conversation_id).update(**{field: F(field) + amount})
+
+    @classmethod
+    def mark_read(cls, conversation, user_id, up_to=None):
+        """
+        Mark every unread message ``user_id`` received in the conversation, up
+        to and including message ``up_to``, as read with one UPDATE; returns
+        how many changed.
+        """
+        messages = Message.objects.filter(conversation=conversation, receiver_id=user_id, is_read=False)
+        if up_to is not None:
+            messages = messages.filter(id__lte=up_to)
+        with transaction.atomic():
+            # queryset.update() skips auto_now, so bump updated_at for syncing clients
+            count = messages.update(is_read=True, updated_at=timezone.now())
+            if count:
+                field = cls.unread_field(conversation.user_a_id, user_id)
+                cls.objects.filter(pk=conversation.pk).update(**{field: Greatest(F(field) - count, 0)})
+        return count
+
+    @classmethod
+    def rebuild(cls, conversation_ids=None):
+        """
+        Recompute latest message and unread counts from the messages
+        themselves, for every conversation or just ``conversation_ids``.
+        """
+        conversations = cls.objects.select_for_update()
+        messages = Message.objects.all()
+        if conversation_ids is not None:
+            conversations = conversations.filter(pk__in=conversation_ids)
+            messages = messages.filter(conversation_id__in=conversation_ids)
+
+        with transaction.atomic():
+            conversations = list(conversations)
+            unread = {
+                (row['conversation'], row['receiver']): row['unread']
+                for row in messages.filter(is_read=False).values('conversation', 'receiver').annotate(unread=Count('pk')).order_by()
+            }
+            latest_ids = messages.values('conversation').annotate(latest=Max('id')).order_by().values_list('latest', flat=True)
+            latest = {
+                conversation_id: (message_id, timestamp)
+                for message_id, conversation_id, timestamp in Message.objects.filter(id__in=list(latest_ids)).values_list('id', 'conversation_id', 'timestamp')
+            }
+            for conversation in conversations:
+                conversation.last_message_id, conversation.last_timestamp = latest.get(conversation.id, (None, None))
+                conversation.unread_a = unread.get((conversation.id, conversation.user_a_id), 0)
+                conversation.unread_b = unread.get((conversation.id, conversation.user_b_id), 0)
+            cls.objects.bulk_update(conversations, ['last_message', 'last_timestamp', 'unread_a', 'unread_b'], batch_size=500)
+        return len(conversations)
 
 class Message(models.Model):
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages', null=True, blank=True)
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sent_messages')
     receiver = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='received_messages')
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
+    # Bumped on every change (including read state), so clients can sync
+    # just what changed since their last cursor
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['sender', 'updated_at'], name='message_sender_updated_idx'),
+            models.Index(fields=['receiver', 'updated_at'], name='message_receiver_updated_idx'),
+            # A conversation's history, newest first
+            models.Index(fields=['conversation', '-id'], name='message_conversation_idx'),
+            models.Index(fields=['receiver', 'is_read'], name='message_receiver_unread_idx'),
+        ]
 
     def __str__(self):
         return f"From {self.sender} to {self.receiver} at {self.timestamp}"
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                # Locked so concurrent saves of this message see each other's read state
+                previous = Message.objects.select_for_update().filter(pk=self.pk).values_list(
+                    'conversation_id', 'sender_id', 'receiver_id', 'is_read',
+                ).first()
+            moved = previous is not None and sorted(previous[1:3]) != sorted((self.sender_id, self.receiver_id))
+            if self.conversation_id is None or moved:
+                self.conversation = Conversation.for_users(self.sender_id, self.receiver_id)
+            super().save(*args, **kwargs)
+            if previous is None:
+                Conversation.record(self)
+            elif moved:
+                Conversation.rebuild([previous[0], self.conversation_id])
+            elif previous[3] != self.is_read:
+                Conversation.adjust_unread(self.conversation_id, self.receiver_id, -1 if self.is_read else 1)
+
+class DeletedMessage(models.Model):
+    """
+    Tombstone for a deleted message, so clients syncing with ``since`` learn
+    to drop it. Plain ids rather than foreign keys: the record has to outlive
+    the message, and the other participant still needs it when deleting a
+    user took the message with them.
+    """
+    message_id = models.BigIntegerField()
+    sender_id = models.BigIntegerField()
+    receiver_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sender_id', 'deleted_at'], name='deleted_message_sender_idx'),
+            models.Index(fields=['receiver_id', 'deleted_at'], name='deleted_message_receiver_idx'),
+        ]
+
+    def __str__(self):
+        return f"Message {self.message_id} deleted at {self.deleted_at}"
+
+    @classmethod
+    def for_user(cls, user):
+        return cls.objects.filter(Q(sender_id=user.id) | Q(receiver_id=user.id))
+
+@receiver(post_delete, sender=Message)
+def record_deleted_message(sender, instance, **kwargs):
+    DeletedMessage.objects.create(message_id=instance.id, sender_id=instance.sender_id, receiver_id=instance.receiver_id)
+
+@receiver(post_delete, sender=Message)
+def remove_message_from_conversation(sender, instance, origin=None, **kwargs):
+    # Deleting a user takes their conversations with them
+    if deleted_with_user(origin, instance.sender_id) or deleted_with_user(origin, instance.receiver_id):
+        return
+    if instance.conversation_id is not None:
+        Conversation.rebuild([instance.conversation_id])
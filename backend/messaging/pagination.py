@@ -0,0 +1,13 @@
+from django.db.models import Q
+
+from backend import cursors
+
+def encode_cursor(last_timestamp, conversation_id):
+    return cursors.encode(last_timestamp, conversation_id)
+
+def decode_cursor(cursor):
+    return cursors.decode(cursor, cursors.timestamp, int)
+
+def after_inbox_position(last_timestamp, conversation_id):
+    """Conversations that sort after the given one in (-last_timestamp, -id) order."""
+    return Q(last_timestamp__lt=last_timestamp) | Q(last_timestamp=last_timestamp, id__lt=conversation_id)
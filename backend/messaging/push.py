@@ -0,0 +1,145 @@
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .hub import hub
+
+STREAM_PATH = '/api/messages/stream'
+WEBSOCKET_PATH = '/ws/messages'
+# Comment line sent on idle streams so proxies don't time them out
+HEARTBEAT_INTERVAL = getattr(settings, 'MESSAGE_PUSH_HEARTBEAT', 25)
+
+
+def authenticate(scope):
+    """
+    User id from a JWT access token in the Authorization header or, since
+    EventSource and browser WebSockets can't set headers, a ``token`` query
+    parameter. Only the signature is checked, so connecting costs no query.
+    """
+    headers = dict(scope.get('headers', []))
+    authorization = headers.get(b'authorization', b'').decode()
+    if authorization.startswith('Bearer '):
+        token = authorization[len('Bearer '):]
+    else:
+        token = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+    if not token:
+        return None
+    try:
+        return AccessToken(token)[api_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return None
+
+
+def cors_headers(scope):
+    # These endpoints bypass Django's middleware, so corsheaders never sees them
+    origin = dict(scope.get('headers', [])).get(b'origin')
+    if origin is None:
+        return []
+    if getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False) or origin.decode() in getattr(settings, 'CORS_ALLOWED_ORIGINS', []):
+        return [(b'access-control-allow-origin', origin), (b'vary', b'Origin')]
+    return []
+
+
+async def wait_for_disconnect(receive, disconnect_type):
+    while (await receive())['type'] != disconnect_type:
+        pass
+
+
+async def pump(subscription, disconnected, emit, heartbeat=None):
+    """Forward the subscription's events through ``emit`` until the client goes away or falls too far behind."""
+    getter = None
+    try:
+        while True:
+            if getter is None:
+                getter = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait({getter, disconnected}, timeout=heartbeat, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                return
+            if getter in done:
+                event, getter = getter.result(), None
+                if subscription.dropped:
+                    return
+                await emit(event)
+            else:
+                await emit(None)
+    finally:
+        if getter is not None:
+            getter.cancel()
+
+
+async def event_stream(scope, receive, send):
+    """
+    Server-Sent Events: a ``message`` event per chat message to or from the
+    user, and a ``read`` event when one side catches up on a conversation.
+    """
+    user_id = authenticate(scope)
+    if user_id is None:
+        await send({
+            'type': 'http.response.start',
+            'status': 401,
+            'headers': [(b'content-type', b'application/json')] + cors_headers(scope),
+        })
+        await send({'type': 'http.response.body', 'body': b'{"error": "Authentication required"}'})
+        return
+
+    subscription = hub.subscribe(user_id)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive, 'http.disconnect'))
+
+    async def emit(event):
+        if event is None:
+            body = b': keepalive\n\n'
+        else:
+            # Only messages carry an id; read receipts aren't something to resume from
+            prefix = f"id: {event['id']}\n" if event.get('id') is not None else ''
+            body = f"{prefix}event: {event.get('event', 'message')}\ndata: {json.dumps(event['data'])}\n\n".encode()
+        await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                # Stop nginx buffering the stream
+                (b'x-accel-buffering', b'no'),
+            ] + cors_headers(scope),
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+        await pump(subscription, disconnected, emit, HEARTBEAT_INTERVAL)
+        if not disconnected.done():
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        hub.unsubscribe(subscription)
+        disconnected.cancel()
+
+
+async def websocket(scope, receive, send):
+    """WebSocket variant of event_stream; each text frame is ``{"event": ..., "data": ...}`` JSON."""
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    user_id = authenticate(scope)
+    if user_id is None:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+
+    await send({'type': 'websocket.accept'})
+    subscription = hub.subscribe(user_id)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive, 'websocket.disconnect'))
+
+    async def emit(event):
+        await send({'type': 'websocket.send', 'text': json.dumps({'event': event.get('event', 'message'), 'data': event['data']})})
+
+    try:
+        await pump(subscription, disconnected, emit)
+        if not disconnected.done():
+            # Fell too far behind; 1013 asks the client to try again later
+            await send({'type': 'websocket.close', 'code': 1013})
+    finally:
+        hub.unsubscribe(subscription)
+        disconnected.cancel()
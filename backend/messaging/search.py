@@ -0,0 +1,89 @@
+import html
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Message
+
+MAX_TERMS = 16
+# Shorter prefixes expand to too many terms to merge quickly; the FTS5
+# table's prefix index covers 2 and 3 characters
+MIN_PREFIX = 3
+# Placeholders the index wraps matches in; swapped for <mark> only after the
+# message text itself has been escaped
+START, STOP = '\x02', '\x03'
+TERM = re.compile(r'\w+')
+
+SQLITE_SEARCH = """
+    SELECT rowid, snippet(messaging_message_fts, 0, %s, %s, '…', 24), bm25(messaging_message_fts, 1.0, 0.0)
+    FROM messaging_message_fts
+    WHERE messaging_message_fts MATCH %s
+    ORDER BY 3
+    LIMIT %s
+"""
+
+POSTGRES_SEARCH = """
+    SELECT id, ts_headline('english', content, query, %s), ts_rank(search_vector, query) AS rank
+    FROM messaging_message, websearch_to_tsquery('english', %s) query
+    WHERE search_vector @@ query AND (sender_id = %s OR receiver_id = %s)
+    ORDER BY rank DESC, id DESC
+    LIMIT %s
+"""
+
+
+def terms(query):
+    return TERM.findall(query.lower())[:MAX_TERMS]
+
+
+def fts5_query(words, user_id):
+    # Every word quoted so nothing the user types is read as FTS syntax; the
+    # last one is a prefix so results keep up while they're still typing
+    phrases = [f'"{word}"' for word in words]
+    if len(words[-1]) >= MIN_PREFIX:
+        phrases[-1] += '*'
+    return f'content : ({" ".join(phrases)}) AND participants : "u{user_id}"'
+
+
+def highlight(fragment):
+    return html.escape(fragment).replace(START, '<mark>').replace(STOP, '</mark>')
+
+
+def search_messages(user, query, limit=20):
+    """
+    The user's best matching messages for ``query``, as ``(message,
+    highlighted snippet, rank)`` tuples. SQLite answers from the FTS5 table
+    and Postgres from the GIN-indexed ``search_vector``; both come from
+    migration 0005. Other databases fall back to an unranked substring scan.
+    """
+    words = terms(query)
+    if not words:
+        return []
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(SQLITE_SEARCH, [START, STOP, fts5_query(words, user.id), limit])
+            # bm25 is lower for better matches; flip it so higher means better everywhere
+            hits = [(message_id, snippet, -score) for message_id, snippet, score in cursor.fetchall()]
+        elif connection.vendor == 'postgresql':
+            options = f'StartSel={START}, StopSel={STOP}, MaxFragments=2, MaxWords=24, MinWords=8'
+            cursor.execute(POSTGRES_SEARCH, [options, query, user.id, user.id, limit])
+            hits = cursor.fetchall()
+        else:
+            hits = None
+
+    if hits is None:
+        matches = Message.objects.filter(Q(sender=user) | Q(receiver=user))
+        for word in words:
+            matches = matches.filter(content__icontains=word)
+        return [
+            (message, html.escape(message.content), None)
+            for message in matches.select_related('sender', 'receiver').order_by('-id')[:limit]
+        ]
+
+    messages = Message.objects.select_related('sender', 'receiver').in_bulk([hit[0] for hit in hits])
+    return [
+        (messages[message_id], highlight(snippet), score)
+        for message_id, snippet, score in hits
+        if message_id in messages
+    ]
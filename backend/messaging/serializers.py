@@ -1,6 +1,7 @@
 from rest_framework import serializers
-from .models import Message
+from .models import Conversation, Message
 from users.serializers import UserSerializer
+from backend.previews import is_truncated, preview
 
 class MessageSerializer(serializers.ModelSerializer):
     sender_name = serializers.ReadOnlyField(source='sender.name')
@@ -8,5 +9,66 @@ class MessageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Message
-        fields = ['id', 'sender', 'receiver', 'sender_name', 'receiver_name', 'content', 'timestamp', 'is_read']
-        read_only_fields = ['sender', 'timestamp']
+        fields = ['id', 'conversation', 'sender', 'receiver', 'sender_name', 'receiver_name', 'content', 'timestamp', 'is_read']
+        read_only_fields = ['conversation', 'sender', 'timestamp']
+
+    def validate_receiver(self, value):
+        # A message belongs to the conversation it was sent in
+        if self.instance is not None and value != self.instance.receiver:
+            raise serializers.ValidationError("A message's receiver can't be changed")
+        return value
+
+# Conversation lists only need enough of each message to preview it; the full
+# text is fetched from the detail endpoint
+MESSAGE_PREVIEW_LENGTH = 500
+
+class MessageListSerializer(MessageSerializer):
+    content = serializers.SerializerMethodField()
+    content_truncated = serializers.SerializerMethodField()
+
+    class Meta(MessageSerializer.Meta):
+        fields = MessageSerializer.Meta.fields + ['content_truncated']
+
+    def get_content(self, instance):
+        return preview(instance.content_preview, MESSAGE_PREVIEW_LENGTH)
+
+    def get_content_truncated(self, instance):
+        return is_truncated(instance.content_preview, MESSAGE_PREVIEW_LENGTH)
+
+class MessageSearchSerializer(MessageSerializer):
+    """A search hit: the matching fragment, escaped with ``<mark>`` around the matched words, instead of the full text."""
+    highlight = serializers.ReadOnlyField()
+    rank = serializers.ReadOnlyField()
+
+    class Meta(MessageSerializer.Meta):
+        fields = [field for field in MessageSerializer.Meta.fields if field != 'content'] + ['highlight', 'rank']
+
+class ConversationSerializer(serializers.ModelSerializer):
+    """A conversation as seen by the requesting user (``context['user_id']``)."""
+    user = serializers.SerializerMethodField()
+    last_message = serializers.SerializerMethodField()
+    unread = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Conversation
+        fields = ['id', 'user', 'last_message', 'last_timestamp', 'unread']
+
+    def get_user(self, instance):
+        other = instance.other_user(self.context['user_id'])
+        return {'id': other.id, 'name': other.name}
+
+    def get_last_message(self, instance):
+        message = instance.last_message
+        if message is None:
+            return None
+        return {
+            'id': message.id,
+            'sender': message.sender_id,
+            'content': preview(message.content, MESSAGE_PREVIEW_LENGTH),
+            'content_truncated': is_truncated(message.content, MESSAGE_PREVIEW_LENGTH),
+            'timestamp': message.timestamp,
+            'is_read': message.is_read,
+        }
+
+    def get_unread(self, instance):
+        return instance.unread_for(self.context['user_id'])
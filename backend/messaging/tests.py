@@ -1,3 +1,258 @@
+import asyncio
+import threading
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import User
+from .hub import Hub, hub
+from .models import Conversation, Message
+
+
+class MessageSyncTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def cursor(self, response):
+        return response['ETag'][3:-1]
+
+    def test_late_commit_inside_overlap_is_not_missed(self):
+        cursor = self.cursor(self.client.get('/api/messages/'))
+        # Stamped just before the client synced, but committed after
+        late = Message.objects.create(sender=self.bob, receiver=self.alice, content='late')
+        Message.objects.filter(pk=late.pk).update(updated_at=timezone.now() - timedelta(seconds=2))
+
+        response = self.client.get('/api/messages/', {'since': cursor})
+        self.assertEqual([message['id'] for message in response.data['results']], [late.id])
+
+    def test_deletions_are_reported(self):
+        message = Message.objects.create(sender=self.bob, receiver=self.alice, content='oops')
+        message_id = message.id
+        cursor = self.cursor(self.client.get('/api/messages/'))
+        message.delete()
+
+        response = self.client.get('/api/messages/', {'since': cursor})
+        self.assertEqual(response.data['deleted'], [message_id])
+
+    def test_since_without_if_none_match_gets_200(self):
+        cursor = self.cursor(self.client.get('/api/messages/'))
+        response = self.client.get('/api/messages/', {'since': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'results': [], 'deleted': []})
+
+    def test_matching_if_none_match_gets_304(self):
+        Message.objects.filter(pk=Message.objects.create(sender=self.bob, receiver=self.alice, content='hi').pk).update(
+            updated_at=timezone.now() - timedelta(minutes=1),
+        )
+        etag = self.client.get('/api/messages/')['ETag']
+        self.assertEqual(self.client.get('/api/messages/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class MessageReceiverChangeTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        self.carol = User.objects.create_user(username='carol', email='carol@example.com', password='pw')
+        self.first = Message.objects.create(sender=self.alice, receiver=self.bob, content='one')
+        self.second = Message.objects.create(sender=self.alice, receiver=self.bob, content='two')
+
+    def test_receiver_cannot_be_changed_through_the_api(self):
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        response = client.patch(f'/api/messages/{self.second.id}', {'receiver': self.carol.id}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Conversation.for_users(self.alice.id, self.bob.id).unread_for(self.bob.id), 2)
+
+    def test_moving_a_message_rehomes_it(self):
+        self.second.receiver = self.carol
+        self.second.save()
+
+        with_bob = Conversation.for_users(self.alice.id, self.bob.id)
+        with_carol = Conversation.for_users(self.alice.id, self.carol.id)
+        self.assertEqual(self.second.conversation_id, with_carol.id)
+        self.assertEqual((with_bob.unread_for(self.bob.id), with_bob.last_message_id), (1, self.first.id))
+        self.assertEqual((with_carol.unread_for(self.carol.id), with_carol.last_message_id), (1, self.second.id))
+
+
+class ConversationTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw', name='Alice')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw', name='Bob')
+        self.client = APIClient()
+        self.client.force_authenticate(self.bob)
+
+    def inbox(self, **params):
+        return self.client.get('/api/messages/conversations', params)
+
+    def test_inbox_tracks_last_message_and_unread(self):
+        first = Message.objects.create(sender=self.alice, receiver=self.bob, content='one')
+        second = Message.objects.create(sender=self.alice, receiver=self.bob, content='two')
+        Message.objects.create(sender=self.bob, receiver=self.alice, content='reply', is_read=True)
+        latest = Message.objects.create(sender=self.bob, receiver=self.alice, content='three')
+
+        [row] = self.inbox().data['results']
+        self.assertEqual((row['user']['name'], row['last_message']['id'], row['unread']), ('Alice', latest.id, 2))
+        conversation = Conversation.for_users(self.alice.id, self.bob.id)
+        self.assertEqual(conversation.unread_for(self.alice.id), 1)
+
+        second.is_read = True
+        second.save()
+        latest.delete()
+        conversation.refresh_from_db()
+        self.assertEqual((conversation.unread_for(self.bob.id), conversation.unread_for(self.alice.id)), (1, 0))
+        self.assertEqual(conversation.last_message.content, 'reply')
+
+        first.delete()
+        self.assertEqual(self.inbox().data['results'][0]['unread'], 0)
+
+    def test_inbox_pages_most_recent_first(self):
+        senders = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='pw')
+            for i in range(3)
+        ]
+        for sender in senders:
+            Message.objects.create(sender=sender, receiver=self.bob, content='hi')
+
+        page = self.inbox(limit=2).data
+        self.assertEqual([row['user']['id'] for row in page['results']], [senders[2].id, senders[1].id])
+        rest = self.inbox(limit=2, cursor=page['next']).data
+        self.assertEqual(([row['user']['id'] for row in rest['results']], rest['next']), ([senders[0].id], None))
+        self.assertEqual(self.inbox(cursor='not-a-cursor').data, {'cursor': 'Invalid cursor'})
+
+
+class MarkReadTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        self.received = [Message.objects.create(sender=self.alice, receiver=self.bob, content=str(i)) for i in range(4)]
+        self.sent = Message.objects.create(sender=self.bob, receiver=self.alice, content='reply')
+        self.conversation = Conversation.for_users(self.alice.id, self.bob.id)
+        self.client = APIClient()
+        self.client.force_authenticate(self.bob)
+
+    def read(self, **data):
+        return self.client.post(f'/api/messages/conversations/{self.conversation.id}/read', data, format='json')
+
+    def unread(self, user):
+        self.conversation.refresh_from_db()
+        return self.conversation.unread_for(user.id)
+
+    def test_marks_received_messages_up_to_a_message(self):
+        self.assertEqual(self.read(up_to=self.received[1].id).data['updated'], 2)
+        self.assertEqual(self.unread(self.bob), 2)
+        self.assertEqual(self.read().data['updated'], 2)
+        self.assertEqual(self.read().data['updated'], 0)
+
+        self.assertEqual((self.unread(self.bob), self.unread(self.alice)), (0, 1))
+        self.assertFalse(Message.objects.get(pk=self.sent.pk).is_read)
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.read(up_to='latest').status_code, 400)
+        outsider = User.objects.create_user(username='carol', email='carol@example.com', password='pw')
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.read().status_code, 404)
+        self.assertEqual(self.unread(self.bob), 4)
+
+
+class MessageSearchTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        self.carol = User.objects.create_user(username='carol', email='carol@example.com', password='pw')
+        self.sent = Message.objects.create(sender=self.alice, receiver=self.bob, content='Did you finish the pendulum lab?')
+        self.received = Message.objects.create(sender=self.carol, receiver=self.alice, content='My <b>pendulum</b> broke')
+        Message.objects.create(sender=self.bob, receiver=self.carol, content='The pendulum lab is due Friday')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def search(self, query):
+        return self.client.get('/api/messages/search', {'q': query})
+
+    def hit_ids(self, query):
+        return sorted(hit['id'] for hit in self.search(query).data['results'])
+
+    def test_hits_are_limited_to_the_users_own_messages(self):
+        self.assertEqual(self.hit_ids('pendulum'), [self.sent.id, self.received.id])
+        self.assertEqual(self.hit_ids('pendulum lab'), [self.sent.id])
+        self.assertEqual(self.hit_ids('friday'), [])
+
+    def test_last_word_matches_as_a_prefix(self):
+        self.assertEqual(self.hit_ids('pend'), [self.sent.id, self.received.id])
+        self.assertEqual(self.hit_ids('pe'), [])
+
+    def test_highlights_are_escaped(self):
+        [hit] = self.search('broke').data['results']
+
+        self.assertEqual(hit['highlight'], 'My &lt;b&gt;pendulum&lt;/b&gt; <mark>broke</mark>')
+
+    def test_index_follows_edits_and_deletes(self):
+        self.sent.content = 'Never mind'
+        self.sent.save()
+        self.received.delete()
+
+        self.assertEqual(self.hit_ids('pendulum'), [])
+        self.assertEqual(self.hit_ids('mind'), [self.sent.id])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('pendulum OR "').status_code, 200)
+        self.assertEqual(self.search('').status_code, 400)
+
+
+class HubTests(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def subscribe(self, target, user_id):
+        async def subscribe():
+            return target.subscribe(user_id)
+        subscription = self.loop.run_until_complete(subscribe())
+        self.addCleanup(target.unsubscribe, subscription)
+        return subscription
+
+    def next_event(self, subscription):
+        return self.loop.run_until_complete(asyncio.wait_for(subscription.queue.get(), 1))
+
+    def test_publish_reaches_every_connection_of_the_recipients(self):
+        local = Hub()
+        phone, laptop, other = self.subscribe(local, 1), self.subscribe(local, '1'), self.subscribe(local, 2)
+
+        # Views publish from request threads, not the connections' loop
+        publisher = threading.Thread(target=local.publish, args=([1, 3], {'id': 7}))
+        publisher.start()
+        publisher.join()
+
+        self.assertEqual((self.next_event(phone), self.next_event(laptop)), ({'id': 7}, {'id': 7}))
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertTrue(other.queue.empty())
+        self.assertEqual(local.connections(), 3)
+
+    def test_slow_subscriber_is_dropped(self):
+        local = Hub(max_pending=1)
+        subscription = self.subscribe(local, 1)
+        local.publish([1], {'id': 1})
+        local.publish([1], {'id': 2})
+        self.loop.run_until_complete(asyncio.sleep(0))
+
+        self.assertTrue(subscription.dropped)
+
+    def test_sent_message_is_pushed_to_both_ends(self):
+        alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        inbox, outbox = self.subscribe(hub, bob.id), self.subscribe(hub, alice.id)
+        client = APIClient()
+        client.force_authenticate(alice)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/messages/', {'receiver': bob.id, 'content': 'hi'}, format='json')
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 201)
+        for subscription in (inbox, outbox):
+            event = self.next_event(subscription)
+            self.assertEqual((event['id'], event['data']['content']), (response.data['id'], 'hi'))
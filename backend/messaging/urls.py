@@ -1,8 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MessageViewSet
+from .views import ConversationViewSet, MessageViewSet
 
 router = DefaultRouter(trailing_slash=False)
+router.register(r'conversations', ConversationViewSet, basename='conversations')
 router.register(r'', MessageViewSet, basename='messages')
 
 urlpatterns = [
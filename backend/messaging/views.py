@@ -1,7 +1,42 @@
-from rest_framework import viewsets, permissions
+from datetime import datetime, timedelta, timezone as dt_timezone
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
-from .models import Message
-from .serializers import MessageSerializer
+from django.utils import timezone
+from backend.previews import with_previews
+from .hub import hub
+from .models import Conversation, DeletedMessage, Message
+from . import pagination
+from .search import search_messages
+from .serializers import (
+    MESSAGE_PREVIEW_LENGTH, ConversationSerializer, MessageSerializer, MessageListSerializer, MessageSearchSerializer,
+)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+# How far sync cursors trail the clock; longer than any write takes to commit
+SYNC_OVERLAP = timedelta(seconds=getattr(settings, 'MESSAGE_SYNC_OVERLAP', 10))
+
+def encode_cursor(moment):
+    # Exact microseconds since the epoch: short, ordered, and safe in an ETag
+    return str((moment - EPOCH) // timedelta(microseconds=1))
+
+def decode_cursor(cursor):
+    try:
+        return EPOCH + timedelta(microseconds=int(cursor))
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise ValidationError({'since': 'Invalid cursor'})
+
+def etag_cursor(if_none_match):
+    # Our ETags are W/"<cursor>"; anything else just doesn't match
+    value = (if_none_match or '').strip()
+    if value.startswith('W/'):
+        value = value[2:]
+    value = value.strip('"')
+    return value if value.isdigit() else None
 
 class MessageViewSet(viewsets.ModelViewSet):
     serializer_class = MessageSerializer
@@ -10,7 +45,141 @@ class MessageViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         # Get messages where user is sender or receiver
-        return Message.objects.filter(Q(sender=user) | Q(receiver=user))
+        queryset = Message.objects.filter(Q(sender=user) | Q(receiver=user)).select_related('sender', 'receiver')
+        if self.action == 'list':
+            queryset = with_previews(queryset, MESSAGE_PREVIEW_LENGTH, 'content')
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """
+        Messages to or from the user. With ``?since=<cursor>`` the response is
+        ``{"results": [...], "deleted": [ids]}`` with just the messages created
+        or changed (e.g. marked read) and the ids of those deleted after the
+        cursor. The ETag carries the cursor for the next call, and a matching
+        If-None-Match with nothing newer gets an empty 304 after indexed
+        existence checks.
+
+        Cursors trail the clock by SYNC_OVERLAP: a write can commit after a
+        later one, so anything stamped within that window is sent again on
+        the next sync rather than possibly missed. Clients merge by id.
+        """
+        queryset = self.get_queryset()
+        deletions = DeletedMessage.for_user(request.user)
+        next_cursor = encode_cursor(timezone.now() - SYNC_OVERLAP)
+
+        known = etag_cursor(request.headers.get('If-None-Match'))
+        if known:
+            moment = decode_cursor(known)
+            if not queryset.filter(updated_at__gt=moment).exists() and not deletions.filter(deleted_at__gt=moment).exists():
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                response['ETag'] = f'W/"{known}"'
+                return response
+
+        since = request.query_params.get('since')
+        if since:
+            moment = decode_cursor(since)
+            changed = queryset.filter(updated_at__gt=moment)
+            deleted = deletions.filter(deleted_at__gt=moment).values_list('message_id', flat=True)
+            data = {'results': self.get_serializer(changed, many=True).data, 'deleted': sorted(set(deleted))}
+            # Never move a client's cursor backwards
+            next_cursor = max(next_cursor, since, key=int)
+        else:
+            data = self.get_serializer(queryset, many=True).data
+
+        response = Response(data)
+        response['ETag'] = f'W/"{next_cursor}"'
+        return response
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return MessageListSerializer
+        return MessageSerializer
 
     def perform_create(self, serializer):
-        serializer.save(sender=self.request.user)
+        message = serializer.save(sender=self.request.user)
+        event = {'id': message.id, 'data': dict(serializer.data)}
+        # Push to both ends' open streams once the row is actually visible
+        transaction.on_commit(lambda: hub.publish([message.sender_id, message.receiver_id], event))
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full-text search over the user's own messages: ``?q=`` (the last word matches as a prefix) and ``?limit=``."""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST)
+        hits = []
+        for message, highlight, rank in search_messages(request.user, query, page_limit(request, 20, 100)):
+            message.highlight, message.rank = highlight, rank
+            hits.append(message)
+        return Response({'results': MessageSearchSerializer(hits, many=True).data})
+
+def page_limit(request, default, maximum):
+    try:
+        return min(max(int(request.query_params.get('limit', default)), 1), maximum)
+    except ValueError:
+        raise ValidationError({'limit': 'limit must be a number'})
+
+class ConversationViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    The inbox, most recently active first, keyset-paginated with ``?cursor``;
+    and each conversation's messages, newest first, paged back in time with
+    ``?before=<message id>``.
+    """
+    serializer_class = ConversationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Conversation.for_user(self.request.user).select_related('user_a', 'user_b', 'last_message')
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'user_id': self.request.user.id}
+
+    def list(self, request, *args, **kwargs):
+        limit = page_limit(request, 20, 100)
+        conversations = self.get_queryset().filter(last_timestamp__isnull=False).order_by('-last_timestamp', '-id')
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            conversations = conversations.filter(pagination.after_inbox_position(*pagination.decode_cursor(cursor)))
+
+        page = list(conversations[:limit + 1])
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = pagination.encode_cursor(page[-1].last_timestamp, page[-1].id)
+        return Response({'results': self.get_serializer(page, many=True).data, 'next': next_cursor})
+
+    @action(detail=True, methods=['get'])
+    def messages(self, request, pk=None):
+        conversation = self.get_object()
+        limit = page_limit(request, 50, 200)
+        messages = conversation.messages.select_related('sender', 'receiver').order_by('-id')
+        before = request.query_params.get('before')
+        if before:
+            try:
+                messages = messages.filter(id__lt=int(before))
+            except ValueError:
+                return Response({"error": "before must be a message id"}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = list(messages[:limit + 1])
+        next_before = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_before = page[-1].id
+        return Response({'results': MessageSerializer(page, many=True).data, 'next': next_before})
+
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        """Mark the conversation read up to ``up_to`` (a message id; everything if omitted) in one UPDATE."""
+        conversation = self.get_object()
+        up_to = request.data.get('up_to')
+        if up_to is not None:
+            try:
+                up_to = int(up_to)
+            except (TypeError, ValueError):
+                return Response({"error": "up_to must be a message id"}, status=status.HTTP_400_BAD_REQUEST)
+        updated = Conversation.mark_read(conversation, request.user.id, up_to)
+        if updated:
+            # One receipt for the whole batch rather than one per message
+            event = {'event': 'read', 'data': {'conversation': conversation.id, 'reader': request.user.id, 'up_to': up_to}}
+            transaction.on_commit(lambda: hub.publish([conversation.user_a_id, conversation.user_b_id], event))
+        return Response({'conversation': conversation.id, 'updated': updated})
@@ -3,11 +3,12 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.db.models import Sum
 from .serializers import UserSerializer, CustomTokenObtainPairSerializer
 
 from .models import User
 from courses.models import Course
-from classroom.models import Classroom, Enrollment, Attendance
+from classroom.models import Classroom, Enrollment, AttendanceRollup, GradeSummary
 from assignments.models import Assignment, Submission
 
 class RegisterView(generics.CreateAPIView):
@@ -90,7 +91,7 @@ class TeacherStatsView(generics.RetrieveAPIView):
         return Response({
             'total_courses': Course.objects.filter(teacher=user).count(),
             'active_classrooms': Classroom.objects.filter(teacher=user).count(),
-            'pending_submissions': Submission.objects.filter(assignment__classroom__teacher=user, grade__isnull=True).count(),
+            'pending_submissions': Submission.pending_for_teacher(user).count(),
             'total_students': Enrollment.objects.filter(classroom__teacher=user).values('user').distinct().count(),
             'assignments_given': Assignment.objects.filter(classroom__teacher=user).count()
         })
@@ -105,15 +106,22 @@ class StudentStatsView(generics.RetrieveAPIView):
             
         enrollments = Enrollment.objects.filter(user=user)
         
-        attendance_records = Attendance.objects.filter(user=user)
-        total_days = attendance_records.count()
-        present_days = attendance_records.filter(status='present').count()
+        attendance = AttendanceRollup.objects.filter(user=user).aggregate(
+            present=Sum('present'), absent=Sum('absent'), late=Sum('late')
+        )
+        present_days = attendance['present'] or 0
+        total_days = present_days + (attendance['absent'] or 0) + (attendance['late'] or 0)
         attendance_percentage = (present_days / total_days * 100) if total_days > 0 else 100
+
+        summary = GradeSummary.objects.filter(user=user).first()
+        gpa = summary.gpa if summary else None
+        average = summary.average if summary else None
         
         return Response({
             'enrolled_courses': enrollments.count(),
             'pending_assignments': Assignment.objects.filter(classroom__enrollments__user=user).exclude(submissions__student=user).count(),
             'attendance': round(attendance_percentage, 1),
             'completed_courses': 0, # Placeholder
-            'gpa': 3.8, # Placeholder
+            'gpa': round(gpa, 2) if gpa is not None else None,
+            'average': round(average, 1) if average is not None else None,
         })
\ No newline at end of file
@@ -1,4 +1,5 @@
 import client from './client';
+import { sha256File } from '../utils/sha256';
 
 export const getAssignments = async (classroomId = null) => {
     const url = classroomId ? `/assignments?classroomId=${classroomId}` : '/assignments';
@@ -30,3 +31,47 @@ export const gradeSubmission = async (submissionId, data) => {
     const response = await client.put(`/submissions/${submissionId}/grade`, data);
     return response.data;
 };
+
+export const batchGradeSubmissions = async (grades) => {
+    const response = await client.post('/assignments/submissions/batch-grade', { grades });
+    return response.data;
+};
+
+const UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024;
+
+// Uploads a submission attachment in chunks. Starting the same file again
+// resumes from whatever the server already has.
+export const uploadSubmissionAttachment = async (assignmentId, file, content, onProgress) => {
+    const checksum = await sha256File(file, UPLOAD_CHUNK_SIZE);
+    const { data: upload } = await client.post('/assignments/uploads', {
+        assignment: assignmentId,
+        filename: file.name,
+        size: file.size,
+        checksum,
+    });
+
+    let offset = upload.received;
+    while (offset < file.size) {
+        try {
+            const { data } = await client.put(
+                `/assignments/uploads/${upload.id}/chunk?offset=${offset}`,
+                file.slice(offset, offset + UPLOAD_CHUNK_SIZE),
+                { headers: { 'Content-Type': 'application/octet-stream' } },
+            );
+            offset = data.received;
+        } catch (error) {
+            // The server is ahead of or behind us; carry on from its offset
+            if (error.response?.status !== 409) throw error;
+            offset = error.response.data.received;
+        }
+        onProgress?.(offset / file.size);
+    }
+
+    const response = await client.post(`/assignments/uploads/${upload.id}/finalize`, { content });
+    return response.data;
+};
+
+export const getSubmissionAttachment = async (submissionId) => {
+    const response = await client.get(`/assignments/submissions/${submissionId}/attachment`, { responseType: 'blob' });
+    return response.data;
+};
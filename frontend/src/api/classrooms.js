@@ -10,6 +10,11 @@ export const getClassroom = async (id) => {
     return response.data;
 };
 
+export const getClassroomRoster = async (id, page = 1) => {
+    const response = await client.get(`/classrooms/${id}/roster`, { params: { page } });
+    return response.data;
+};
+
 export const createClassroom = async (data) => {
     const response = await client.post('/classrooms', data);
     return response.data;
@@ -25,7 +30,23 @@ export const getAnnouncements = async (classroomId) => {
     return response.data;
 };
 
+// The full text of one announcement; the list only carries a preview of long ones.
+export const getAnnouncement = async (announcementId) => {
+    const response = await client.get(`/classrooms/announcements/${announcementId}`);
+    return response.data;
+};
+
 export const createAnnouncement = async (data) => {
     const response = await client.post('/classrooms/announcements', data);
     return response.data;
 };
+
+export const openCheckIn = async (classroomId, minutes = 10) => {
+    const response = await client.post(`/classrooms/${classroomId}/check-in-session`, { minutes });
+    return response.data;
+};
+
+export const checkIn = async (code) => {
+    const response = await client.post('/classrooms/attendance/check-in', { code });
+    return response.data;
+};
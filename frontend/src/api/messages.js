@@ -5,12 +5,72 @@ export const getMessages = async () => {
     return response.data;
 };
 
+// The full text of one message; lists only carry a preview of long ones.
+export const getMessage = async (messageId) => {
+    const response = await client.get(`/messages/${messageId}`);
+    return response.data;
+};
+
+// Messages created or changed since `cursor` (everything when it's null),
+// plus the ids of any deleted since then. The next cursor comes back in the
+// ETag; a 304 means nothing changed. Messages already seen may come back
+// again and should be merged by id.
+export const syncMessages = async (cursor) => {
+    const response = await client.get('/messages', {
+        params: cursor ? { since: cursor } : {},
+        validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+    });
+    const etag = response.headers.etag;
+    const data = response.status === 304 ? { results: [], deleted: [] } : response.data;
+    return {
+        messages: Array.isArray(data) ? data : data.results,
+        deleted: Array.isArray(data) ? [] : data.deleted,
+        cursor: etag ? etag.replace(/^W\//, '').replace(/"/g, '') : cursor,
+    };
+};
+
+// Inbox, most recent first. Pass the previous page's `next` as cursor.
+export const getConversations = async (cursor = null) => {
+    const response = await client.get('/messages/conversations', { params: cursor ? { cursor } : {} });
+    return response.data;
+};
+
+// A conversation's messages, newest first. Pass the previous page's `next` as before.
+export const getConversationMessages = async (conversationId, before = null) => {
+    const response = await client.get(`/messages/conversations/${conversationId}/messages`, {
+        params: before ? { before } : {},
+    });
+    return response.data;
+};
+
 export const sendMessage = async (data) => {
     const response = await client.post('/messages', data);
     return response.data;
 };
 
-export const markAsRead = async (id) => {
-    const response = await client.patch(`/messages/${id}`, { is_read: true });
+// Marks everything received in the conversation up to message `upTo` as read in one request
+export const markConversationRead = async (conversationId, upTo) => {
+    const response = await client.post(`/messages/conversations/${conversationId}/read`, { up_to: upTo });
     return response.data;
 };
+
+// Best matches first; each hit's `highlight` is escaped HTML with <mark> around matched words.
+export const searchMessages = async (query, limit = 20) => {
+    const response = await client.get('/messages/search', { params: { q: query, limit } });
+    return response.data.results;
+};
+
+// Server-Sent Events stream of messages to or from the current user, plus
+// read receipts. onFallback runs if the stream can't be kept open (e.g. a
+// WSGI-only deployment).
+export const openMessageStream = (onMessage, onFallback, onOpen, onRead) => {
+    const token = localStorage.getItem('token');
+    const source = new EventSource(`${client.defaults.baseURL}/messages/stream?token=${encodeURIComponent(token)}`);
+    source.addEventListener('message', (event) => onMessage(JSON.parse(event.data)));
+    source.addEventListener('read', (event) => onRead?.(JSON.parse(event.data)));
+    source.onopen = () => onOpen?.();
+    source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) onFallback();
+    };
+    return source;
+};
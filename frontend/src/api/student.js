@@ -11,9 +11,8 @@ export const getMyCourses = async () => {
     return response.data;
 };
 
-export const getUpcomingAssignments = async () => {
-    // We can filter this on the frontend or backend
-    const response = await client.get('/assignments');
+export const getUpcomingAssignments = async (days = 14) => {
+    const response = await client.get('/assignments/upcoming', { params: { days } });
     return response.data;
 };
 
@@ -43,15 +43,13 @@ const AssignmentSubmit = () => {
 
         setLoading(true);
         try {
-            const { submitAssignment } = await import('../../api/assignments');
+            const { submitAssignment, uploadSubmissionAttachment } = await import('../../api/assignments');
 
-            const formData = new FormData();
-            formData.append('content', submissionText);
             if (files.length > 0) {
-                formData.append('attachment', files[0]);
+                await uploadSubmissionAttachment(id, files[0], submissionText);
+            } else {
+                await submitAssignment(id, { content: submissionText });
             }
-
-            await submitAssignment(id, formData);
             setStatus('Submitted');
             alert("Work submitted successfully!");
         } catch (error) {
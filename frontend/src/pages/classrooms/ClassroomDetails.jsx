@@ -46,6 +46,7 @@ const ClassroomDetails = () => {
                     type: 'announcement',
                     title: ann.title,
                     content: ann.content,
+                    truncated: ann.content_truncated,
                     date: new Date(ann.createdAt),
                     dateStr: new Date(ann.createdAt).toLocaleDateString(),
                     author: ann.author?.name || data.teacher?.name
@@ -112,6 +113,7 @@ const ClassroomDetails = () => {
                 type: 'announcement',
                 title: ann.title,
                 content: ann.content,
+                truncated: ann.content_truncated,
                 date: new Date(ann.createdAt),
                 dateStr: new Date(ann.createdAt).toLocaleDateString(),
                 author: ann.author?.name || data.teacher?.name
@@ -128,6 +130,23 @@ const ClassroomDetails = () => {
         }
     };
 
+    const expandAnnouncement = async (announcementId) => {
+        try {
+            const { getAnnouncement } = await import('../../api/classrooms');
+            const full = await getAnnouncement(announcementId);
+            setClassroom((current) => ({
+                ...current,
+                stream: current.stream.map((post) => (
+                    post.type === 'announcement' && post.id === announcementId
+                        ? { ...post, content: full.content, truncated: false }
+                        : post
+                )),
+            }));
+        } catch (error) {
+            console.error("Failed to load announcement", error);
+        }
+    };
+
     if (loading) return (
         <div className="min-h-screen bg-background-light dark:bg-background-dark flex flex-col items-center justify-center">
             <div className="w-12 h-12 border-4 border-primary border-t-transparent rounded-full animate-spin"></div>
@@ -256,7 +275,12 @@ const ClassroomDetails = () => {
                                                 {post.type === 'announcement' && post.title && (
                                                     <h3 className="mt-3 font-bold text-slate-900 dark:text-white">{post.title}</h3>
                                                 )}
-                                                {post.content && <p className="mt-3 text-sm text-slate-700 dark:text-slate-300 whitespace-pre-wrap">{post.content}</p>}
+                                                {post.content && <p className="mt-3 text-sm text-slate-700 dark:text-slate-300 whitespace-pre-wrap">{post.truncated ? `${post.content}…` : post.content}</p>}
+                                                {post.truncated && (
+                                                    <button type="button" onClick={() => expandAnnouncement(post.id)} className="mt-2 text-sm font-medium text-primary hover:underline">
+                                                        Read more
+                                                    </button>
+                                                )}
                                             </div>
                                         </div>
                                     </div>
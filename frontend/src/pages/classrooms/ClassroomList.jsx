@@ -19,7 +19,7 @@ const ClassroomList = () => {
                 const formattedData = data.map(c => ({
                     ...c,
                     bgImage: c.bannerUrl || 'https://images.unsplash.com/photo-1577896851231-70ef18881754?w=800&q=80', // Default image
-                    teacher: c.teacher || { name: 'Unknown', avatar: null }
+                    teacher: { name: c.teacher_name || 'Unknown', avatar: null }
                 }));
                 setClassrooms(formattedData);
             } catch (error) {
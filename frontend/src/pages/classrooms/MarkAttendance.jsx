@@ -78,20 +78,19 @@ const MarkAttendance = () => {
         e.preventDefault();
         setSubmitting(true);
         try {
-            const promises = Object.entries(attendance).map(([userId, status]) => {
-                return client.post('/classrooms/attendance', {
-                    user: userId,
-                    classroom: selectedClassroom,
-                    date: date,
+            await client.post('/classrooms/attendance/bulk', {
+                classroom: selectedClassroom,
+                date: date,
+                records: Object.entries(attendance).map(([userId, status]) => ({
+                    user: Number(userId),
                     status: status
-                });
+                }))
             });
-            await Promise.all(promises);
             alert("Attendance marked successfully!");
             navigate('/dashboard/teacher');
         } catch (error) {
             console.error("Failed to mark attendance", error);
-            alert("Failed to mark attendance. Some records might already exist for this date.");
+            alert("Failed to mark attendance.");
         } finally {
             setSubmitting(false);
         }
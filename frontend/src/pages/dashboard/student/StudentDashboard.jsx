@@ -12,7 +12,7 @@ const StudentDashboard = () => {
         pending_assignments: 0,
         completed_courses: 0,
         attendance: 100,
-        gpa: 3.8
+        gpa: null
     });
     const [courses, setCourses] = useState([]);
     const [assignments, setAssignments] = useState([]);
@@ -238,7 +238,7 @@ const StudentDashboard = () => {
                                         <span className="material-symbols-outlined text-xl">grade</span>
                                         <span className="text-xs font-bold uppercase tracking-wide text-slate-500 dark:text-slate-400">GPA</span>
                                     </div>
-                                    <p className="text-2xl font-bold text-slate-900 dark:text-white">{stats.gpa}</p>
+                                    <p className="text-2xl font-bold text-slate-900 dark:text-white">{stats.gpa ?? "-"}</p>
                                 </div>
                             </div>
 
@@ -282,7 +282,7 @@ const StudentDashboard = () => {
                                                 <div>
                                                     <h4 className="font-bold text-slate-900 dark:text-white">{assignment.title}</h4>
                                                     <div className="flex items-center gap-2 text-xs text-slate-500">
-                                                        <span className={`rounded bg-primary/5 px-2 py-0.5 font-medium text-primary`}>{assignment.classroom?.course?.title || 'Course'}</span>
+                                                        <span className={`rounded bg-primary/5 px-2 py-0.5 font-medium text-primary`}>{assignment.course_title || 'Course'}</span>
                                                         <span>•</span>
                                                         <span>Due {assignment.due_date ? new Date(assignment.due_date).toLocaleDateString() : 'TBD'}</span>
                                                     </div>
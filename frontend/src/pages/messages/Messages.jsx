@@ -1,7 +1,7 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../../hooks/useAuth';
-import { getMessages, sendMessage, markAsRead } from '../../api/messages';
+import { syncMessages, getMessage, sendMessage, markConversationRead, openMessageStream } from '../../api/messages';
 import client from '../../api/client';
 
 const Messages = () => {
@@ -18,15 +18,42 @@ const Messages = () => {
 
     useEffect(() => {
         fetchMessages();
-        const interval = setInterval(fetchMessages, 5000); // Poll for new messages every 5s
-        return () => clearInterval(interval);
+        let interval = null;
+        let reconnecting = false;
+        // New messages are pushed by the server; fall back to polling for changes if the stream isn't available
+        const stream = openMessageStream(
+            addMessage,
+            () => {
+                if (!interval) interval = setInterval(fetchMessages, 5000);
+            },
+            () => {
+                // Catch up on anything missed while the stream was reconnecting
+                if (reconnecting) fetchMessages();
+                reconnecting = true;
+            },
+            applyReadReceipt,
+        );
+        return () => {
+            stream.close();
+            if (interval) clearInterval(interval);
+        };
     }, []);
 
+    // Only messages created or changed since this cursor are fetched after the first load
+    const cursorRef = useRef(null);
+
     const fetchMessages = async () => {
         try {
-            const data = await getMessages();
-            setMessages(data);
-            groupIntoConversations(data);
+            const { messages: changed, deleted, cursor } = await syncMessages(cursorRef.current);
+            const firstLoad = cursorRef.current === null;
+            cursorRef.current = cursor;
+            if (firstLoad) {
+                setMessages(changed);
+                groupIntoConversations(changed);
+            } else {
+                if (deleted.length > 0) removeMessages(deleted);
+                if (changed.length > 0) mergeMessages(changed);
+            }
         } catch (error) {
             console.error("Failed to fetch messages", error);
         } finally {
@@ -34,6 +61,58 @@ const Messages = () => {
         }
     };
 
+    // Newer versions replace what we have (e.g. read state), keeping any full
+    // text already fetched over a list preview; new ones go on top
+    const mergeMessages = (incoming) => {
+        setMessages((current) => {
+            const byId = new Map(incoming.map((m) => [m.id, m]));
+            const merge = (m) => {
+                const newer = byId.get(m.id);
+                if (!newer) return m;
+                return newer.content_truncated && !m.content_truncated
+                    ? { ...newer, content: m.content, content_truncated: false }
+                    : newer;
+            };
+            const updated = [
+                ...incoming.filter((m) => !current.some((c) => c.id === m.id)),
+                ...current.map(merge),
+            ].sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
+            groupIntoConversations(updated);
+            return updated;
+        });
+    };
+
+    const addMessage = (message) => mergeMessages([message]);
+
+    const removeMessages = (ids) => {
+        const gone = new Set(ids);
+        setMessages((current) => {
+            const updated = current.filter((m) => !gone.has(m.id));
+            groupIntoConversations(updated);
+            return updated;
+        });
+    };
+
+    const expandMessage = async (messageId) => {
+        try {
+            mergeMessages([await getMessage(messageId)]);
+        } catch (error) {
+            console.error("Failed to load message", error);
+        }
+    };
+
+    const applyReadReceipt = ({ conversation, reader, up_to }) => {
+        setMessages((current) => {
+            const updated = current.map((m) => (
+                m.conversation === conversation && m.receiver === reader && !m.is_read && (up_to === null || m.id <= up_to)
+                    ? { ...m, is_read: true }
+                    : m
+            ));
+            groupIntoConversations(updated);
+            return updated;
+        });
+    };
+
     const groupIntoConversations = (msgList) => {
         const convoMap = {};
         msgList.forEach(m => {
@@ -59,9 +138,8 @@ const Messages = () => {
                 receiver: selectedConversation.user.id,
                 content: newMessage
             });
-            setMessages([data, ...messages]);
+            addMessage(data);
             setNewMessage('');
-            fetchMessages(); // Refresh conversations
         } catch (error) {
             console.error("Failed to send message", error);
         }
@@ -93,6 +171,16 @@ const Messages = () => {
         ? messages.filter(m => (m.sender === selectedConversation.user.id) || (m.receiver === selectedConversation.user.id)).sort((a, b) => new Date(a.timestamp) - new Date(b.timestamp))
         : [];
 
+    // Opening a chat marks everything in it read with a single request
+    const unreadInConvo = currentConvoMessages.filter((m) => m.receiver === user.id && !m.is_read);
+    const lastUnread = unreadInConvo.length > 0 ? unreadInConvo[unreadInConvo.length - 1] : null;
+    useEffect(() => {
+        if (!lastUnread?.conversation) return;
+        markConversationRead(lastUnread.conversation, lastUnread.id)
+            .then(() => applyReadReceipt({ conversation: lastUnread.conversation, reader: user.id, up_to: lastUnread.id }))
+            .catch((error) => console.error("Failed to mark messages as read", error));
+    }, [lastUnread?.id]);
+
     if (loading) return <div className="flex items-center justify-center min-h-screen">Loading Chat...</div>;
 
     return (
@@ -156,7 +244,12 @@ const Messages = () => {
                             {currentConvoMessages.map((m, idx) => (
                                 <div key={m.id || idx} className={`flex ${m.sender === user.id ? 'justify-end' : 'justify-start'}`}>
                                     <div className={`max-w-[70%] rounded-2xl px-4 py-2.5 shadow-sm text-sm ${m.sender === user.id ? 'bg-primary text-white rounded-tr-none' : 'bg-white dark:bg-slate-800 dark:text-white rounded-tl-none'}`}>
-                                        <p>{m.content}</p>
+                                        <p>{m.content_truncated ? `${m.content}…` : m.content}</p>
+                                        {m.content_truncated && (
+                                            <button type="button" onClick={() => expandMessage(m.id)} className={`text-xs font-medium underline mt-1 ${m.sender === user.id ? 'text-blue-100' : 'text-primary'}`}>
+                                                Show more
+                                            </button>
+                                        )}
                                         <p className={`text-[10px] mt-1 ${m.sender === user.id ? 'text-blue-100' : 'text-slate-400'}`}>
                                             {new Date(m.timestamp).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })}
                                         </p>